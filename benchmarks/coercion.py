@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+Micro-benchmarks for field coercion. Prints the time taken to coerce a single
+value with each field type, and per value when coercing a column of values
+with ``coerce_many``.
+
+For the fields whose per-call setup is now done once, the ``previous`` column
+times the same value with the per-call approach they used before: rebuilding
+the currency regex and the decimal quantum, listing the boolean map's keys
+and slugifying without a cache.
+
+Run from the repository root with ``python benchmarks/coercion.py``.
+'''
+from __future__ import print_function, unicode_literals
+
+import os
+import re
+import sys
+import timeit
+from decimal import Decimal
+
+
+def get_previous_fields():
+    from django.utils.encoding import smart_text
+    from django.utils.six import string_types
+
+    from filemaker import fields
+
+    def coerce_decimal(self, value):
+        if not isinstance(value, Decimal):
+            value = Decimal(smart_text(value))
+        if self.decimal_places is not None \
+                and isinstance(self.decimal_places, int):
+            quant = '0'.join('' for x in range(self.decimal_places + 1))
+            quant = Decimal('.{0}'.format(quant))
+            value = value.quantize(quant)
+        return value
+
+    class PreviousDecimalField(fields.DecimalField):
+
+        coerce = coerce_decimal
+
+    class PreviousCurrencyField(fields.CurrencyField):
+
+        def coerce(self, value):
+            if isinstance(value, string_types):
+                symbols = list(fields.CURRENCY_SYMBOLS)
+                value = re.sub(
+                    r'^({0})'.format(r'|'.join(symbols)), '', value.strip()
+                ).strip()
+            return coerce_decimal(self, value)
+
+    class PreviousBooleanField(fields.BooleanField):
+
+        def coerce(self, value):
+            if value in list(self.map.keys()):
+                return self.map.get(value)
+            return super(PreviousBooleanField, self).coerce(value)
+
+    class PreviousSlugField(fields.SlugField):
+
+        def coerce(self, value):
+            value = fields.CharField.coerce(self, value)
+            if self.auto:
+                value = self.slugify(value)
+            return value
+
+    return {
+        'CurrencyField': PreviousCurrencyField(),
+        'DecimalField': PreviousDecimalField(decimal_places=2),
+        'BooleanField': PreviousBooleanField(map={'Ja': True}),
+        'SlugField': PreviousSlugField(),
+    }
+
+
+def get_benchmarks():
+    from filemaker import fields
+    return (
+        ('CurrencyField', fields.CurrencyField(), '£12.50'),
+        ('DecimalField', fields.DecimalField(decimal_places=2), '12.505'),
+        ('BooleanField', fields.BooleanField(map={'Ja': True}), 'Ja'),
+        ('SlugField', fields.SlugField(), 'A Fairly Long Product Title'),
+        ('IntegerField', fields.IntegerField(), '1234'),
+        ('DateTimeField', fields.DateTimeField(), '01/03/2012 12:30:02'),
+    )
+
+
+def time_value(field, value, number):
+    def single():
+        field.value = value
+    return timeit.Timer(single).timeit(number) / number * 1e6
+
+
+def run(number=10000, column=100):
+    previous_fields = get_previous_fields()
+    print('{0:<16}{1:>14}{2:>14}{3:>18}'.format(
+        'Field', 'previous (us)', 'value (us)', 'coerce_many (us)'))
+    for name, field, value in get_benchmarks():
+        values = [value] * column
+
+        def many():
+            field.coerce_many(values)
+
+        previous = previous_fields.get(name)
+        if previous is not None:
+            assert previous.coerce(value) == field.coerce(value)
+            previous_time = '{0:.2f}'.format(
+                time_value(previous, value, number))
+        else:
+            previous_time = '-'
+        single_time = time_value(field, value, number)
+        many_time = timeit.Timer(many).timeit(number // column)
+        print('{0:<16}{1:>14}{2:>14.2f}{3:>18.2f}'.format(
+            name, previous_time, single_time, many_time / number * 1e6))
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_project.settings')
+    run()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+from __future__ import division, unicode_literals
+
+
+class Aggregate(object):
+    '''
+    The base class for the aggregates used with
+    :py:meth:`filemaker.manager.Manager.aggregate` and
+    :py:meth:`filemaker.manager.Manager.annotate`. An aggregate reduces the
+    values of a field one at a time, so the values never need to be held in
+    memory together.
+
+    :param field: The name of the field to aggregate, which can be a field of
+        a related model as for :py:meth:`filemaker.manager.Manager.values`.
+    '''
+
+    name = None
+
+    def __init__(self, field):
+        self.field = field
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(self.__class__.__name__, self.field)
+
+    @property
+    def default_alias(self):
+        return '{0}__{1}'.format(self.field, self.name)
+
+    def initial(self):
+        '''
+        Returns the state to reduce the first value into.
+        '''
+        return None
+
+    def add(self, state, value):
+        '''
+        Returns the state after reducing ``value`` into ``state``. ``None``
+        values are ignored.
+        '''
+        raise NotImplementedError
+
+    def result(self, state):
+        '''
+        Returns the aggregated value for the final ``state``.
+        '''
+        return state
+
+
+class Count(Aggregate):
+    '''
+    Counts the values of ``field`` that are not ``None``, or the records if no
+    field is given.
+    '''
+
+    name = 'count'
+
+    def __init__(self, field=None):
+        super(Count, self).__init__(field)
+
+    @property
+    def default_alias(self):
+        if self.field is None:
+            return self.name
+        return super(Count, self).default_alias
+
+    def initial(self):
+        return 0
+
+    def add(self, state, value):
+        return state + 1 if value is not None else state
+
+
+class Sum(Aggregate):
+    '''
+    The sum of the values of ``field``, or ``None`` if there are none.
+    '''
+
+    name = 'sum'
+
+    def add(self, state, value):
+        if value is None:
+            return state
+        return value if state is None else state + value
+
+
+class Min(Aggregate):
+    '''
+    The smallest value of ``field``, or ``None`` if there are none.
+    '''
+
+    name = 'min'
+
+    def add(self, state, value):
+        if value is None:
+            return state
+        return value if state is None or value < state else state
+
+
+class Max(Aggregate):
+    '''
+    The largest value of ``field``, or ``None`` if there are none.
+    '''
+
+    name = 'max'
+
+    def add(self, state, value):
+        if value is None:
+            return state
+        return value if state is None or value > state else state
+
+
+class Avg(Aggregate):
+    '''
+    The mean of the values of ``field``, or ``None`` if there are none.
+    '''
+
+    name = 'avg'
+
+    def initial(self):
+        return (0, 0)
+
+    def add(self, state, value):
+        if value is None:
+            return state
+        return (state[0] + value, state[1] + 1)
+
+    def result(self, state):
+        total, count = state
+        return total / count if count else None
@@ -1,12 +1,15 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import threading
 from copy import deepcopy
 
 from django.db.models import FieldDoesNotExist, ForeignKey, ManyToManyField
 from django.utils import six
 
-from filemaker.exceptions import FileMakerObjectDoesNotExist
+from filemaker.exceptions import (FileMakerObjectDoesNotExist,
+                                  FileMakerValidationError)
+from filemaker.utils import LRUCache
 
 try:
     from functools import total_ordering
@@ -43,6 +46,109 @@ except ImportError:  # pragma: no cover
         return cls
 
 
+_local = threading.local()
+
+
+class IdentityMap(object):
+    '''
+    While an identity map is active (it is used as a context manager) each
+    FileMaker record is only made into one instance of each model. Creating
+    a model instance from a record that has already been loaded, whether as a
+    result, in a portal, or through a ``ModelField``, returns the existing
+    instance rather than coercing the record again. Records are identified by
+    the table they were read from (the layout's table, or the portal's) and
+    their ``RECORDID`` and ``MODID``, so a record that has been modified is
+    loaded again, and instances are only shared between loads made the same
+    way, so e.g. a :py:meth:`filemaker.manager.Manager.trusted` load never
+    returns an instance to a load that validates its fields.
+    ::
+
+        with IdentityMap():
+            shows = list(Show.objects.filter(year=2014))
+            # The shows found by both queries are the same instances
+            featured = list(Show.objects.filter(featured=True))
+
+    Records without a ``RECORDID``, records that don't hold all of the
+    model's fields (e.g. portal records with only some of the related model's
+    fields), and instances loaded with only some of their fields (see
+    :py:meth:`filemaker.manager.Manager.only`), are not added to the map.
+    Use
+    :py:class:`filemaker.middleware.IdentityMapMiddleware` to use a map for
+    each request.
+    '''
+
+    def __init__(self):
+        self.instances = {}
+
+    def __len__(self):
+        return len(self.instances)
+
+    def _key(self, model, fm_obj):
+        from filemaker.fields import get_coercion_context
+        record_id = getattr(fm_obj, 'RECORDID', None)
+        if record_id is None or not _has_fields(model, fm_obj):
+            return None
+        # How the instance was loaded: whether it was validated, whether its
+        # fields are lazy, and which related fields were prefetched
+        context = get_coercion_context()
+        if context is None:
+            mode = (True, False, ())
+        else:
+            mode = (context.validate, context.lazy, context.prefetch)
+        # RECORDIDs are only unique within a table
+        table = getattr(fm_obj, '_table', None)
+        return (model, table, record_id, getattr(fm_obj, 'MODID', None), mode)
+
+    def get(self, model, fm_obj):
+        '''
+        Returns the instance of ``model`` loaded from the record ``fm_obj``,
+        or ``None``.
+        '''
+        key = self._key(model, fm_obj)
+        return self.instances.get(key) if key is not None else None
+
+    def add(self, model, fm_obj, instance):
+        '''
+        Adds the ``instance`` of ``model`` loaded from the record ``fm_obj``
+        to the map.
+        '''
+        key = self._key(model, fm_obj)
+        if key is not None:
+            self.instances[key] = instance
+
+    def __enter__(self):
+        if not hasattr(_local, 'identity_maps'):
+            _local.identity_maps = []
+        _local.identity_maps.append(self)
+        return self
+
+    def __exit__(self, *args):
+        _local.identity_maps.remove(self)
+
+
+def _has_fields(model, fm_obj):
+    # Whether the record holds the data for all of the model's fields, rather
+    # than e.g. just the fields on a portal
+    if not isinstance(fm_obj, dict):
+        return False
+    for field in model._fields.values():
+        if field.fm_attr == '+self':
+            if not _has_fields(field.model, fm_obj):
+                return False
+        elif field.fm_attr.split('.', 1)[0].split('::', 1)[0] not in fm_obj:
+            return False
+    return True
+
+
+def get_identity_map():
+    '''
+    Returns the active :py:class:`IdentityMap` for the current thread, or
+    ``None``.
+    '''
+    identity_maps = getattr(_local, 'identity_maps', None)
+    return identity_maps[-1] if identity_maps else None
+
+
 class ManagerDescriptor(object):
 
     def __init__(self, manager):
@@ -84,6 +190,7 @@ class BaseFileMakerModel(type):
                 new_attrs.append((attr_name, attr_value))
         fields = dict(fields)
         new_attrs.append(('_fields', fields))
+        new_attrs.append(('_relation_cache', {}))
         meta = {
             'connection': None,
             'pk_name':
@@ -93,6 +200,8 @@ class BaseFileMakerModel(type):
             'django_field_map': None,
             'abstract': False,
             'to_many_action': 'clear',
+            'lazy': False,
+            'response_layouts': {},
             'ordering': 'id' if 'id' in fields else None,
             'default_manager': Manager,
             'related': [],
@@ -100,6 +209,9 @@ class BaseFileMakerModel(type):
         }
         if isinstance(meta_override, dict):
             meta.update(meta_override)
+        # The parsed connections for the model's managers, usually just the
+        # one in meta but bounded in case the connection is changed
+        meta['connection_cache'] = LRUCache(4)
         new_attrs.append(('_meta', meta))
         new_class = super_new(cls, name, bases, dict(new_attrs))
         new_class._attach_manager()
@@ -125,6 +237,20 @@ class BaseFileMakerModel(type):
                     ManagerDescriptor(cls._meta['default_manager'])
                 )
 
+    def __call__(cls, *args, **kwargs):
+        # Instances created from a record are shared while an IdentityMap is
+        # active
+        fm_obj = args[0] if args else kwargs.get('fm_obj')
+        identity_map = get_identity_map() if fm_obj is not None else None
+        if identity_map is not None:
+            instance = identity_map.get(cls, fm_obj)
+            if instance is not None:
+                return instance
+        instance = super(BaseFileMakerModel, cls).__call__(*args, **kwargs)
+        if identity_map is not None:
+            identity_map.add(cls, fm_obj, instance)
+        return instance
+
     def _process_fields(cls):
         for field in cls._fields.values():
             if hasattr(field, 'contribute_to_class'):
@@ -135,6 +261,7 @@ class BaseFileMakerModel(type):
 class FileMakerModel(six.with_metaclass(BaseFileMakerModel)):
 
     def __init__(self, fm_obj=None, **kwargs):
+        from filemaker.fields import get_coercion_context
         self._fields = deepcopy(self._fields)
         self._meta = deepcopy(self._meta)
 
@@ -151,7 +278,14 @@ class FileMakerModel(six.with_metaclass(BaseFileMakerModel)):
         for field_name, field in self._fields.items():
             field._value = field.default
             setattr(self.__class__, field_name, make_prop(field_name))
-        if fm_obj is not None:
+        context = get_coercion_context()
+        if fm_obj is not None and (
+                self._meta['lazy'] or (context is not None and context.lazy)):
+            if context is not None:
+                context = context.eager()
+            for field_name, field in self._fields.items():
+                field._defer(deep_getattr(fm_obj, field.fm_attr), context)
+        elif fm_obj is not None:
             for field_name, field in self._fields.items():
                 value = deep_getattr(fm_obj, field.fm_attr)
                 field.value = value
@@ -159,8 +293,46 @@ class FileMakerModel(six.with_metaclass(BaseFileMakerModel)):
             for name, value in kwargs.items():
                 setattr(self, name, value)
         self._fm_obj = fm_obj
+        # The names of the fields that were loaded from the record, or None
+        # if all of them were
+        self._loaded_fields = None
         super(FileMakerModel, self).__init__()
 
+    @classmethod
+    def _from_coerced(cls, fm_obj, values, loaded_fields=None):
+        '''
+        Creates an instance from a dictionary of field names to values that
+        have already been coerced, e.g. by a field's ``coerce_many`` method.
+
+        :param loaded_fields: (*Optional*) The names of the fields loaded
+            from the record, if it was loaded with only some of its fields.
+            The other fields are not written by :py:meth:`to_django`.
+        '''
+        instance = cls()
+        for field_name, value in values.items():
+            instance._fields[field_name]._value = value
+        instance._fm_obj = fm_obj
+        if loaded_fields is not None:
+            instance._loaded_fields = frozenset(loaded_fields)
+        return instance
+
+    def full_clean(self):
+        '''
+        Coerces and validates the value of every field, raising a
+        :py:exc:`filemaker.exceptions.FileMakerValidationError` with the
+        errors for all of the fields that are invalid. This is only needed for
+        ``lazy`` instances, where the fields are otherwise only coerced when
+        they are first accessed.
+        '''
+        errors = {}
+        for field_name, field in self._fields.items():
+            try:
+                field.value
+            except FileMakerValidationError as e:
+                errors[field_name] = e.messages
+        if errors:
+            raise FileMakerValidationError(errors)
+
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
             return False
@@ -201,11 +373,21 @@ class FileMakerModel(six.with_metaclass(BaseFileMakerModel)):
         from filemaker.fields import ModelField, ModelListField
         if self._meta.get('model', None) is None:
             return
+        loaded = self._loaded_fields
+        pk_name = self._meta['pk_name']
+        if loaded is not None and pk_name and pk_name not in loaded:
+            raise ValueError(
+                'Cannot save {0} to Django without loading its {1} field'
+                .format(self.__class__.__name__, pk_name))
         obj = self.get_django_instance()
         to_one_rels = []
         to_many_rels = []
         if self._meta['django_field_map']:
             for field, dj_field in self._meta['django_field_map']:
+                # Fields that weren't loaded would overwrite the Django
+                # instance's values with their defaults
+                if loaded is not None and field not in loaded:
+                    continue
                 if isinstance(self._fields[field], ModelListField):
                     to_many_rels.append((dj_field, self._fields[field]))
                 elif isinstance(self._fields[field], ModelField):
@@ -215,6 +397,8 @@ class FileMakerModel(six.with_metaclass(BaseFileMakerModel)):
                             self._fields[field].to_django())
         else:
             for field, instance in self._fields.items():
+                if loaded is not None and field not in loaded:
+                    continue
                 if isinstance(instance, ModelListField):
                     to_many_rels.append((field, instance))
                 elif isinstance(instance, ModelField):
@@ -228,32 +412,105 @@ class FileMakerModel(six.with_metaclass(BaseFileMakerModel)):
             obj.save()
         for field_name, field in to_many_rels:
             instances = field.to_django(save=False)
-            try:
-                obj._meta.get_field(field_name)
-            except FieldDoesNotExist:
-                # If we're here then this is a reverse relationship
-                rel_field = None
-                for model_field in field.model._meta['model']._meta.fields:
-                    if isinstance(model_field, (ForeignKey, ManyToManyField)) \
-                            and model_field.rel.to == obj.__class__:
-                        rel_field = model_field.name
-                        break
+            action = self._meta['to_many_action']
+            relation, rel_field = self._resolve_to_many_relation(
+                field_name, field, obj.__class__)
+            if relation == 'reverse':
                 if rel_field is not None:
-                    if self._meta['to_many_action'] == 'clear':
-                        field.model._meta['model']._default_manager.filter(
-                            **{rel_field: obj}).delete()
                     [setattr(instance, rel_field, obj)
                         for instance in instances]
+                    rel_manager = \
+                        field.model._meta['model']._default_manager
+                    if action == 'diff':
+                        stale = rel_manager.filter(**{rel_field: obj})
+                        self._diff_save(rel_manager, instances, stale)
+                        continue
+                    if action == 'clear':
+                        rel_manager.filter(**{rel_field: obj}).delete()
                 [instance.save() for instance in instances]
             else:
-                # This looks like a m2m on the obj
                 manager = getattr(obj, field_name)
-                if self._meta['to_many_action'] == 'clear':
+                if action == 'diff':
+                    linked = set(manager.values_list('pk', flat=True))
+                    pks = self._diff_save(
+                        manager.model._default_manager, instances)
+                    stale = linked - pks
+                    if stale:
+                        manager.remove(*stale)
+                    if pks - linked:
+                        manager.add(*(pks - linked))
+                    continue
+                if action == 'clear':
                     manager.clear()
                 [instance.save() for instance in instances]
                 manager.add(*instances)
         return obj
 
+    @classmethod
+    def _resolve_to_many_relation(cls, field_name, field, django_model):
+        '''
+        Works out how the to-many ``field`` maps onto ``django_model``.
+
+        Returns a tuple of ``('m2m', field_name)`` if ``field_name`` is a
+        many-to-many field on ``django_model``, or ``('reverse', rel_field)``
+        if it is a reverse relation, where ``rel_field`` is the name of the
+        field on the related Django model pointing back at ``django_model``
+        (or ``None`` if there isn't one).
+
+        The result is cached on the class, so the model introspection only
+        happens once per field and Django model.
+        '''
+        key = (field_name, django_model)
+        try:
+            return cls._relation_cache[key]
+        except KeyError:
+            pass
+        try:
+            django_model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            # If we're here then this is a reverse relationship
+            rel_field = None
+            for model_field in field.model._meta['model']._meta.fields:
+                if isinstance(model_field, (ForeignKey, ManyToManyField)) \
+                        and model_field.rel.to == django_model:
+                    rel_field = model_field.name
+                    break
+            relation = ('reverse', rel_field)
+        else:
+            # This looks like a m2m on the django model
+            relation = ('m2m', field_name)
+        cls._relation_cache[key] = relation
+        return relation
+
+    def _diff_save(self, manager, instances, stale=None):
+        '''
+        Writes the related Django ``instances`` with the fewest queries
+        possible: rows not already in the database are created with a single
+        ``bulk_create``, existing rows are only saved if they have changed,
+        and any rows in the ``stale`` queryset that are no longer present are
+        deleted in bulk.
+
+        Returns the set of primary keys of the written instances.
+        '''
+        pks = set(i.pk for i in instances if i.pk is not None)
+        if stale is not None:
+            stale.exclude(pk__in=pks).delete()
+        existing = manager.in_bulk(list(pks)) if pks else {}
+        new = []
+        for instance in instances:
+            if instance.pk is None:
+                # Without a pk we cannot find the row again after a
+                # bulk_create, so it has to be saved on its own.
+                instance.save()
+                pks.add(instance.pk)
+            elif instance.pk not in existing:
+                new.append(instance)
+            elif _has_changed(instance, existing[instance.pk]):
+                instance.save()
+        if new:
+            manager.bulk_create(new)
+        return pks
+
     def to_dict(self, *args, **kwargs):
         from filemaker.fields import ModelField, ModelListField
         field_dict = {}
@@ -268,6 +525,14 @@ class FileMakerModel(six.with_metaclass(BaseFileMakerModel)):
         return field_dict
 
 
+def _has_changed(instance, original):
+    for field in instance._meta.fields:
+        if getattr(instance, field.attname) != \
+                getattr(original, field.attname):
+            return True
+    return False
+
+
 def deep_getattr(obj, attr):
     value = obj
     if not hasattr(attr, 'strip') or not attr.strip():
@@ -37,6 +37,10 @@ class FilemakerAppConf(AppConf):
         fields.URLField: 'filemaker.fields.URLField',
     }
     DJANGO_FIELD_MAP_OVERRIDES = {}
+    SYNC_BATCH_SIZE = 100
+    SYNC_PAGE_SIZE = 500
+    PREFETCH_BATCH_SIZE = 50
+    AGGREGATE_PAGE_SIZE = 500
 
     class Meta:
         prefix = 'filemaker'
@@ -300,6 +300,7 @@ class FileMakerServerError(FileMakerError):
     def __init__(self, code=-1):
         if not code in self.error_codes:
             code = -1
+        self.code = code
         self.message = 'FileMaker Error: {0}: {1}'.format(
             code, self.error_codes.get(code))
 
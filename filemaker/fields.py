@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import copy
 import datetime
 import hashlib
 import mimetypes
 import re
+import threading
+from array import array
 from decimal import Decimal
 
 import requests
@@ -19,10 +22,12 @@ from django.template.defaultfilters import slugify
 from django.utils import timezone
 from django.utils.encoding import (smart_text, smart_bytes, force_text,
                                    python_2_unicode_compatible)
-from django.utils.six import string_types, text_type
+from django.utils.six import (get_unbound_function, integer_types,
+                              string_types, text_type)
 
 from filemaker.exceptions import FileMakerValidationError
-from filemaker.validators import validate_gtin
+from filemaker.utils import LRUCache
+from filemaker import validators as fm_validators
 
 try:  # pragma: no cover
     from functools import total_ordering
@@ -59,11 +64,232 @@ except ImportError:  # pragma: no cover
         return cls
 
 try:
-    from pytz import NonExistentTimeError
+    from pytz import AmbiguousTimeError, NonExistentTimeError
 except ImportError:
     class NonExistentTimeError(Exception):  # NOQA
         pass
 
+    class AmbiguousTimeError(Exception):  # NOQA
+        pass
+
+
+FM_FORMAT_TOKENS = (
+    ('yyyy', 'year', 4),
+    ('MM', 'month', 2),
+    ('dd', 'day', 2),
+    ('HH', 'hour', 2),
+    ('mm', 'minute', 2),
+    ('ss', 'second', 2),
+)
+
+_compiled_formats = {}
+
+
+def compile_fm_format(fm_format):
+    '''
+    Compiles a FileMaker date, time or timestamp format, as declared on the
+    ``datasource`` element of a response (e.g. ``MM/dd/yyyy HH:mm:ss``), into
+    a function that parses strings in that format by position.
+
+    The function returns a ``datetime.datetime``, or ``None`` if the string
+    does not match the format. Compiled formats are cached, and ``None`` is
+    returned for formats that cannot be compiled.
+    '''
+    if fm_format in _compiled_formats:
+        return _compiled_formats[fm_format]
+    slices = []
+    separators = []
+    i = position = 0
+    while i < len(fm_format):
+        for token, name, width in FM_FORMAT_TOKENS:
+            if fm_format.startswith(token, i):
+                slices.append((name, position, position + width))
+                position += width
+                i += len(token)
+                break
+        else:
+            if fm_format[i].isalpha():
+                # An unsupported token, e.g. a 12 hour clock or month name
+                _compiled_formats[fm_format] = None
+                return None
+            separators.append((position, fm_format[i]))
+            position += 1
+            i += 1
+    length = position
+    names = set(name for name, start, end in slices)
+    if not names or len(names) < len(slices):
+        _compiled_formats[fm_format] = None
+        return None
+
+    def parse(value):
+        if not len(value) == length:
+            return None
+        for index, separator in separators:
+            if not value[index] == separator:
+                return None
+        parts = {'year': 1900, 'month': 1, 'day': 1}
+        for name, start, end in slices:
+            part = value[start:end]
+            if not part.isdigit():
+                return None
+            parts[name] = int(part)
+        try:
+            return datetime.datetime(**parts)
+        except ValueError:
+            return None
+
+    _compiled_formats[fm_format] = parse
+    return parse
+
+
+_local = threading.local()
+
+
+class CoercionContext(object):
+    '''
+    Holds state that is shared by the fields coercing the records of a single
+    FileMaker response. While a context is active (it is used as a context
+    manager) fields will use it in preference to working things out on a per
+    value basis, e.g. the :py:class:`DateTimeField` uses the date formats
+    declared by the response, and the current timezone and UTC offsets
+    cached by the context.
+
+    :param database: (*Optional*) The ``database`` attribute of the
+        :py:class:`filemaker.parser.FMXMLObject` being coerced.
+    :param validate: (*Optional*) Whether fields should run their
+        validators. Defaults to ``True``, set it to ``False`` for data that is
+        already known to be valid.
+    :param lazy: (*Optional*) Whether model instances created in the context
+        should defer coercing their fields until they are accessed, see the
+        ``lazy`` model meta option. Defaults to ``False``.
+    :param prefetch: (*Optional*) The names of the fields whose related
+        records were fetched by
+        :py:meth:`filemaker.manager.Manager.prefetch_related`.
+    '''
+
+    def __init__(self, database=None, validate=True, lazy=False,
+                 prefetch=()):
+        self.validate = validate
+        self.lazy = lazy
+        self.prefetch = tuple(prefetch)
+        self._eager = None
+        self.use_tz = settings.USE_TZ
+        self.timezone = timezone.get_current_timezone()
+        self.utc_offsets = {}
+        self.parsers = {}
+        formats = []
+        for key in ('date-format', 'timestamp-format'):
+            fm_format = (database or {}).get(key)
+            if isinstance(fm_format, string_types):
+                parser = compile_fm_format(fm_format)
+                if parser is not None:
+                    self.parsers[key] = parser
+                    formats.append((key, fm_format))
+        self.key = (self.use_tz, self.timezone, tuple(formats))
+
+    def make_utc(self, value):
+        '''
+        Converts the naive local datetime ``value`` to UTC. The UTC offset is
+        cached for each date, so this only needs to consult the timezone once
+        per date, unless the date has a DST transition.
+        '''
+        day = value.date()
+        try:
+            offset = self.utc_offsets[day]
+        except KeyError:
+            offset = self.utc_offsets[day] = self._get_utc_offset(day)
+        if offset is None:
+            return make_utc(value, self.timezone)
+        return (value - offset).replace(tzinfo=timezone.utc)
+
+    def _get_utc_offset(self, day):
+        try:
+            start, end = [
+                timezone.make_aware(
+                    datetime.datetime.combine(day, time), self.timezone)
+                .utcoffset()
+                for time in (datetime.time.min, datetime.time.max)
+            ]
+        except (NonExistentTimeError, AmbiguousTimeError):
+            return None
+        return start if start == end else None
+
+    def eager(self):
+        '''
+        Returns a copy of the context that is not ``lazy``, sharing the cached
+        state of this one. It is used to coerce the deferred values of lazy
+        instances, so that any related instances are not lazy in turn.
+        '''
+        if not self.lazy:
+            return self
+        if self._eager is None:
+            self._eager = copy.copy(self)
+            self._eager.lazy = False
+        return self._eager
+
+    def __enter__(self):
+        if not hasattr(_local, 'contexts'):
+            _local.contexts = []
+        _local.contexts.append(self)
+        return self
+
+    def __exit__(self, *args):
+        _local.contexts.pop()
+
+
+def make_utc(value, tz, combined=False):
+    '''
+    Makes the naive ``value`` aware in the timezone ``tz``, and converts it to
+    UTC.
+
+    If ``combined`` is ``True``, ``value`` is a date combined with a time
+    and is adjusted by the DST offset of ``tz``.
+    '''
+    try:
+        if combined:
+            # If we combined the date with datetime.time.min we
+            # should adjust by dst to get the correct datetime
+            value += tz.dst(value)
+        value = timezone.make_aware(value, tz)
+    except NonExistentTimeError:
+        value = tz.localize(value)
+    return timezone.utc.normalize(value)
+
+
+def get_coercion_context():
+    '''
+    Returns the active :py:class:`CoercionContext` for the current thread, or
+    ``None``.
+    '''
+    contexts = getattr(_local, 'contexts', None)
+    return contexts[-1] if contexts else None
+
+
+def validating():
+    '''
+    Returns ``False`` if the active :py:class:`CoercionContext` has turned
+    validation off, otherwise ``True``.
+    '''
+    context = get_coercion_context()
+    return context is None or context.validate
+
+
+TRUE_VALUES = frozenset(['y', 'yes', 'true', 't', '1'])
+
+IMMUTABLE_TYPES = (
+    string_types, bytes, bool, int, float, Decimal, datetime.date,
+    datetime.time, type(None),
+) + tuple(t for t in integer_types if t is not int)
+
+_missing = object()
+
+
+def _overrides_coerce(field, cls):
+    # Whether the field's class has its own coerce method rather than that of
+    # cls, in which case a fast path written for cls.coerce can't be used
+    return get_unbound_function(type(field).coerce) is not \
+        get_unbound_function(cls.coerce)
+
 
 @total_ordering
 @python_2_unicode_compatible
@@ -76,6 +302,7 @@ class BaseFileMakerField(object):
     '''
 
     _value = None
+    _deferred = None
     name = None
     fm_attr = None
     validators = []
@@ -83,6 +310,7 @@ class BaseFileMakerField(object):
     max = None
     null_values = [None, '']
     fm_null_value = ''
+    cache_size = None
 
     def __init__(self, fm_attr=None, *args, **kwargs):
         self.fm_attr = fm_attr
@@ -91,6 +319,8 @@ class BaseFileMakerField(object):
         self._value = self.default
         self.min = kwargs.pop('min', self.min)
         self.max = kwargs.pop('max', self.max)
+        self.cache_size = kwargs.pop('cache_size', self.cache_size)
+        self._cache = LRUCache(self.cache_size) if self.cache_size else None
         for key, value in kwargs.items():
             if key == 'fm_attr':
                 continue
@@ -112,16 +342,52 @@ class BaseFileMakerField(object):
         return '{0}{1}'.format(repr(self), self.name).__hash__()
 
     def _set_value(self, value):
+        self._value = self._clean(value)
+        self._deferred = None
+
+    def _defer(self, value, context=None):
+        # Keeps the raw value, and the context it was read in, to coerce when
+        # the value is first accessed
+        self._deferred = (value, context)
+
+    def _clean(self, value):
+        key = None
+        if self._cache is not None:
+            try:
+                key = self._cache_key(value)
+                hash(key)
+            except TypeError:
+                key = None
+            else:
+                cached = self._cache.get(key, _missing)
+                if cached is not _missing:
+                    return cached
         try:
-            self._value = self._coerce(value)
+            cleaned = self._coerce(value)
         except (ValueError, TypeError, UnicodeError):
             raise FileMakerValidationError(
                 '"{0}" is an invalid value for {1} ({2})'
                 .format(value, self.name, self.__class__.__name__),
                 field=self
             )
+        if key is not None and isinstance(cleaned, IMMUTABLE_TYPES) \
+                and (not self.validators or validating()):
+            self._cache.set(key, cleaned)
+        return cleaned
+
+    def _cache_key(self, value):
+        # The type is included as e.g. 1, 1.0 and True are all equal
+        return type(value), value
 
     def _get_value(self):
+        if self._deferred is not None:
+            value, context = self._deferred
+            if context is None:
+                self._value = self._clean(value)
+            else:
+                with context:
+                    self._value = self._clean(value)
+            self._deferred = None
         return self._value
 
     value = property(_get_value, _set_value)
@@ -142,7 +408,7 @@ class BaseFileMakerField(object):
         if self.max is not None and value > self.max:
             raise ValueError('{0} must be less than or equal to {1}.'
                              .format(self.name, smart_text(self.max)))
-        if self.validators:
+        if self.validators and validating():
             for validator in self.validators:
                 try:
                     validator(value)
@@ -157,6 +423,38 @@ class BaseFileMakerField(object):
     def coerce(self, value):
         raise NotImplementedError()
 
+    def coerce_many(self, values):
+        '''
+        Coerces and validates a list of values, e.g. a column of values from
+        a page of FileMaker records, returning a list of the results. This
+        does not change the value of the field.
+
+        Raises :py:exc:`filemaker.exceptions.FileMakerValidationError` for the
+        first invalid value, just as setting the field value would.
+        '''
+        return [self._clean(value) for value in values]
+
+    def _map_many(self, values, convert):
+        # A fast path for coerce_many where the non-null values can be
+        # converted by a single function and there are no checks to make on
+        # the result. Any failure falls back to coercing the values one by
+        # one, so that errors are raised in the usual way.
+        if (self.validators and validating()) or self.min is not None \
+                or self.max is not None or self._cache is not None:
+            return BaseFileMakerField.coerce_many(self, values)
+        null_values = self.null_values
+        results = []
+        append = results.append
+        try:
+            for value in values:
+                if value in null_values:
+                    append(self._clean(value))
+                else:
+                    append(convert(value))
+        except (ValueError, TypeError, UnicodeError, ArithmeticError):
+            return BaseFileMakerField.coerce_many(self, values)
+        return results
+
     def to_django(self, *args, **kwargs):
         return self.value
 
@@ -174,6 +472,11 @@ class UnicodeField(BaseFileMakerField):
     def coerce(self, value):
         return smart_text(value)
 
+    def coerce_many(self, values):
+        if _overrides_coerce(self, UnicodeField):
+            return self._map_many(values, self.coerce)
+        return self._map_many(values, smart_text)
+
 
 class CharField(UnicodeField):
     '''
@@ -204,7 +507,7 @@ class EmailField(CharField):
     address.
     '''
 
-    validators = [validators.validate_email]
+    validators = [fm_validators.validate_email]
 
 
 class IPAddressField(CharField):
@@ -213,7 +516,7 @@ class IPAddressField(CharField):
     or IPv6 address.
     '''
 
-    validators = [validators.validate_ipv46_address]
+    validators = [fm_validators.validate_ipv46_address]
 
 
 class IPv4AddressField(CharField):
@@ -222,7 +525,7 @@ class IPv4AddressField(CharField):
     address.
     '''
 
-    validators = [validators.validate_ipv4_address]
+    validators = [fm_validators.validate_ipv4_address]
 
 
 class IPv6AddressField(CharField):
@@ -231,7 +534,7 @@ class IPv6AddressField(CharField):
     address.
     '''
 
-    validators = [validators.validate_ipv6_address]
+    validators = [fm_validators.validate_ipv6_address]
 
 
 class IntegerField(BaseFileMakerField):
@@ -239,9 +542,16 @@ class IntegerField(BaseFileMakerField):
     Coerces data into an integer.
     '''
 
+    array_typecode = 'q'
+
     def coerce(self, value):
         return int(value)
 
+    def coerce_many(self, values):
+        if _overrides_coerce(self, IntegerField):
+            return self._map_many(values, self.coerce)
+        return self._map_many(values, int)
+
 
 class PositiveIntegerField(IntegerField):
     '''
@@ -283,9 +593,16 @@ class FloatField(BaseFileMakerField):
     Coerces data into a float.
     '''
 
+    array_typecode = 'd'
+
     def coerce(self, value):
         return float(value)
 
+    def coerce_many(self, values):
+        if _overrides_coerce(self, FloatField):
+            return self._map_many(values, self.coerce)
+        return self._map_many(values, float)
+
 
 class DecimalField(BaseFileMakerField):
     '''
@@ -297,28 +614,40 @@ class DecimalField(BaseFileMakerField):
 
     decimal_places = None
 
+    def __init__(self, fm_attr=None, *args, **kwargs):
+        super(DecimalField, self).__init__(fm_attr=fm_attr, *args, **kwargs)
+        self._quantum = None
+        if self.decimal_places is not None \
+                and isinstance(self.decimal_places, int):
+            self._quantum = Decimal(1).scaleb(-self.decimal_places)
+
     def coerce(self, value):
         if not isinstance(value, Decimal):
             value = Decimal(smart_text(value))
-        if self.decimal_places is not None \
-                and isinstance(self.decimal_places, int):
-            quant = '0'.join('' for x in range(self.decimal_places + 1))
-            quant = Decimal('.{0}'.format(quant))
-            value = value.quantize(quant)
+        if self._quantum is not None:
+            value = value.quantize(self._quantum)
         return value
 
+    def coerce_many(self, values):
+        return self._map_many(values, self.coerce)
+
 
 @python_2_unicode_compatible
 class DateTimeField(BaseFileMakerField):
     '''
     Coerces data into a datetime.datetime instance.
 
+    When coercing the records of a FileMaker response, strings are first
+    parsed using the date formats declared by the response (see
+    :py:class:`CoercionContext`) before falling back to ``dateutil``.
+
     :param strptime: An optional strptime string to use if falling back to the
         datetime.datetime.strptime method
     '''
 
     combine_datetime = datetime.time.min
     strptime = None
+    datasource_formats = ('timestamp-format', 'date-format')
 
     def __str__(self):
         if self.value:
@@ -326,6 +655,39 @@ class DateTimeField(BaseFileMakerField):
         return 'None'
 
     def coerce(self, value):
+        value, combined = self._to_datetime(value)
+        context = get_coercion_context()
+        use_tz = context.use_tz if context is not None else settings.USE_TZ
+        if use_tz and timezone.is_naive(value):
+            if context is None:
+                return make_utc(
+                    value, timezone.get_current_timezone(), combined)
+            elif combined:
+                return make_utc(value, context.timezone, combined)
+            return context.make_utc(value)
+        elif not use_tz and timezone.is_aware(value):
+            tz = context.timezone if context is not None \
+                else timezone.get_current_timezone()
+            value = timezone.make_naive(value, tz)
+        return value
+
+    def coerce_many(self, values):
+        if get_coercion_context() is None:
+            # Share the timezone and UTC offsets across the values
+            with CoercionContext():
+                return super(DateTimeField, self).coerce_many(values)
+        return super(DateTimeField, self).coerce_many(values)
+
+    def _cache_key(self, value):
+        # How a value is coerced depends on the timezone and the date formats
+        # of the response, so these need to be part of the key
+        context = get_coercion_context()
+        if context is None:
+            return (type(value), value, settings.USE_TZ,
+                    timezone.get_current_timezone(), None)
+        return (type(value), value) + context.key
+
+    def _to_datetime(self, value):
         combined = False
         if isinstance(value, datetime.datetime):
             value = value
@@ -335,13 +697,18 @@ class DateTimeField(BaseFileMakerField):
         elif isinstance(value, string_types) and self.strptime is not None:
             value = datetime.datetime.strptime(value, self.strptime)
         elif isinstance(value, string_types) and value.strip():
-            try:
-                value = parser.parse(value)
-            except OverflowError as e:
+            parsed = self._parse_datasource_format(value)
+            if parsed is not None:
+                value = parsed
+            else:
                 try:
-                    value = datetime.datetime.strptime(value, '%Y%m%d%H%M%S')
-                except ValueError:
-                    raise e
+                    value = parser.parse(value)
+                except OverflowError as e:
+                    try:
+                        value = datetime.datetime.strptime(
+                            value, '%Y%m%d%H%M%S')
+                    except ValueError:
+                        raise e
         elif isinstance(value, (list, tuple)):
             value = datetime.datetime(*value)
         elif isinstance(value, (int, float)):
@@ -349,21 +716,19 @@ class DateTimeField(BaseFileMakerField):
         else:
             raise TypeError('Cannot convert {0} to datetime instance'
                             .format(type(value)))
-        if settings.USE_TZ and timezone.is_naive(value):
-            try:
-                tz = timezone.get_current_timezone()
-                if combined:
-                    # If we combined the date with datetime.time.min we
-                    # should adjust by dst to get the correct datetime
-                    value += tz.dst(value)
-                value = timezone.make_aware(
-                    value, timezone.get_current_timezone())
-            except NonExistentTimeError:
-                value = timezone.get_current_timezone().localize(value)
-            value = timezone.utc.normalize(value)
-        elif not settings.USE_TZ and timezone.is_aware(value):
-            value = timezone.make_naive(value, timezone.get_current_timezone())
-        return value
+        return value, combined
+
+    def _parse_datasource_format(self, value):
+        context = get_coercion_context()
+        if context is None:
+            return None
+        for key in self.datasource_formats:
+            parse = context.parsers.get(key)
+            if parse is not None:
+                parsed = parse(value)
+                if parsed is not None:
+                    return parsed
+        return None
 
     def to_filemaker(self):
         return getattr(self.value, 'isoformat', lambda: '')()
@@ -377,10 +742,22 @@ class DateField(DateTimeField):
         datetime.datetime.strptime method
     '''
 
+    datasource_formats = ('date-format', 'timestamp-format')
+
     def coerce(self, value):
-        dt = super(DateField, self).coerce(value)
+        dt, combined = self._to_datetime(value)
         if timezone.is_aware(dt):
-            dt = timezone.get_current_timezone().normalize(dt)
+            # A naive datetime is already in local time, so only aware ones
+            # need converting to get the local date
+            context = get_coercion_context()
+            if context is not None and not context.use_tz:
+                dt = timezone.make_naive(dt, context.timezone)
+            elif context is not None:
+                dt = context.timezone.normalize(dt)
+            else:
+                dt = super(DateField, self).coerce(dt)
+                if timezone.is_aware(dt):
+                    dt = timezone.get_current_timezone().normalize(dt)
         return dt.date()
 
 
@@ -399,20 +776,44 @@ class BooleanField(BaseFileMakerField):
             fm_attr=fm_attr, *args, **kwargs)
 
     def coerce(self, value):
-        if value in list(self.map.keys()):
-            return self.map.get(value)
+        try:
+            if value in self.map:
+                return self.map[value]
+        except TypeError:
+            # The value is unhashable, so can't be in the map
+            pass
         if isinstance(value, bool):
             return value
         elif isinstance(value, (int, float)):
             return not value == 0
         elif isinstance(value, string_types):
             value = value.strip().lower()
-            if value in ['y', 'yes', 'true', 't', '1']:
+            if value in TRUE_VALUES:
                 return True
             return False
         else:
             return bool(value)
 
+    def coerce_many(self, values):
+        if (self.validators and validating()) or self.min is not None \
+                or self.max is not None or self._cache is not None \
+                or _overrides_coerce(self, BooleanField):
+            return super(BooleanField, self).coerce_many(values)
+        mapping = self.map
+        null_values = self.null_values
+        results = []
+        append = results.append
+        for value in values:
+            if isinstance(value, string_types) and \
+                    value not in null_values:
+                if value in mapping:
+                    append(mapping[value])
+                else:
+                    append(value.strip().lower() in TRUE_VALUES)
+            else:
+                append(self._clean(value))
+        return results
+
     def to_filemaker(self):
         if self.value in self.reverse_map:
             return self.reverse_map.get(self.value)
@@ -434,41 +835,67 @@ class NullBooleanField(BooleanField):
             return None
         return super(NullBooleanField, self).coerce(value)
 
+    def coerce_many(self, values):
+        # The 'None' string has to go through coerce
+        return BaseFileMakerField.coerce_many(self, values)
+
 
 class ListField(BaseFileMakerField):
     '''
     A field that takes a list of values of other types.
 
     :param base_type: The base field type to use.
+    :param typed: (*Optional*) If ``True`` the values are stored in a compact
+        ``array.array`` rather than a list. Only base types with an
+        ``array_typecode``, i.e. :py:class:`IntegerField` and
+        :py:class:`FloatField`, can be typed, and a typed list cannot contain
+        ``None``. Defaults to ``False``.
     '''
 
     base_type = None
+    typed = False
+    _plans = {}
 
     def __init__(self, fm_attr=None, *args, **kwargs):
         self.base_type = kwargs.pop('base_type', None)
         if self.base_type is None:
             raise ValueError('You must specify a base_type')
-        return super(ListField, self)\
-            .__init__(fm_attr=fm_attr, *args, **kwargs)
+        super(ListField, self).__init__(fm_attr=fm_attr, *args, **kwargs)
+        if self.typed and not getattr(self.base_type, 'array_typecode', None):
+            raise ValueError('{0} cannot be typed'.format(
+                self.base_type.__name__))
+
+    def _get_plan(self):
+        # A single instance of the base type is shared by every list field
+        # using it, its coerce_many does all the work so it holds no state
+        try:
+            return self._plans[self.base_type]
+        except KeyError:
+            return self._plans.setdefault(self.base_type, self.base_type())
 
     def coerce(self, value):
-        values = []
-        for val in value:
-            sub_type = self.base_type()
-            sub_type.value = val
-            values.append(sub_type.value)
+        plan = self._get_plan()
+        values = plan.coerce_many(value)
+        if self.typed:
+            try:
+                return array(str(plan.array_typecode), values)
+            except OverflowError as e:
+                raise ValueError(e)
         return values
 
     def to_django(self, *args, **kwargs):
+        if isinstance(self.value, array):
+            return self.value.tolist()
         try:
             return [v.to_django(*args, **kwargs) for v in self.value]
         except AttributeError:
             return self.value
 
     def to_filemaker(self):
+        plan = self._get_plan()
         values = []
         for val in self.value:
-            sub_type = self.base_type()
+            sub_type = copy.copy(plan)
             sub_type.value = val
             values.append(sub_type.to_filemaker())
         return values
@@ -577,6 +1004,23 @@ class PercentageField(DecimalField):
         return '{0}%'.format(smart_text(self.value))
 
 
+CURRENCY_SYMBOLS = [
+    '¤', '؋', '฿', 'B/.', 'Bs.', 'Bs.F.', 'GH¢', '¢', 'Ch.', '₡',
+    'D', 'ден', 'دج', '.د.ب', 'د.ع', 'د.ك', 'ل.د', 'дин', 'د.ت',
+    'د.م.', 'د.إ', '\$', '[a-zA-z]{1,3}\$', '\$[a-zA-Z]{1,3}',
+    '元', '圓', '元', '圓', '₫', '€', '€', 'ƒ', 'Afl.', 'NAƒ',
+    'FCFA', '₣', 'G₣', 'S₣', 'Fr.', '₲', '₴', '₭', 'Kč', 'Íkr',
+    'K.D.', 'ლ', 'm.', '₥', '₦', 'Nu.', '₱', '£', '₤',
+    '[a-zA-Z]{1,2}[£₤]', 'ج.م.', 'Pt.', 'ريال', 'ر.ع.', 'ر.ق',
+    'ر.س',  'ریال', '៛', '₹', '₹', '₨', '₪', 'KSh', 'Sh.So.',
+    'S/.', 'лв', 'сом', '৳', '₸', '₮', 'VT', '₩', '¥', '円', '圓',
+    '元', '圆', 'zł', '₳', '₢', '₰', '₯', '₠', 'ƒ', '₣', '₤',
+    'Kčs', 'ℳ', '₧', 'ℛℳ', '₷', '₶', '[a-zA-Z]{1,4}',
+]
+
+CURRENCY_SYMBOLS_RE = re.compile(r'^({0})'.format(r'|'.join(CURRENCY_SYMBOLS)))
+
+
 class CurrencyField(DecimalField):
     '''
     A decimal field that uses 2 decimal places and strips off any currency
@@ -590,22 +1034,7 @@ class CurrencyField(DecimalField):
 
     def coerce(self, value):
         if isinstance(value, string_types):
-            symbols = [
-                '¤', '؋', '฿', 'B/.', 'Bs.', 'Bs.F.', 'GH¢', '¢', 'Ch.', '₡',
-                'D', 'ден', 'دج', '.د.ب', 'د.ع', 'د.ك', 'ل.د', 'дин', 'د.ت',
-                'د.م.', 'د.إ', '\$', '[a-zA-z]{1,3}\$', '\$[a-zA-Z]{1,3}',
-                '元', '圓', '元', '圓', '₫', '€', '€', 'ƒ', 'Afl.', 'NAƒ',
-                'FCFA', '₣', 'G₣', 'S₣', 'Fr.', '₲', '₴', '₭', 'Kč', 'Íkr',
-                'K.D.', 'ლ', 'm.', '₥', '₦', 'Nu.', '₱', '£', '₤',
-                '[a-zA-Z]{1,2}[£₤]', 'ج.م.', 'Pt.', 'ريال', 'ر.ع.', 'ر.ق',
-                'ر.س',  'ریال', '៛', '₹', '₹', '₨', '₪', 'KSh', 'Sh.So.',
-                'S/.', 'лв', 'сом', '৳', '₸', '₮', 'VT', '₩', '¥', '円', '圓',
-                '元', '圆', 'zł', '₳', '₢', '₰', '₯', '₠', 'ƒ', '₣', '₤',
-                'Kčs', 'ℳ', '₧', 'ℛℳ', '₷', '₶', '[a-zA-Z]{1,4}',
-            ]
-            value = re.sub(
-                r'^({0})'.format(r'|'.join(symbols)), '', value.strip()
-            ).strip()
+            value = CURRENCY_SYMBOLS_RE.sub('', value.strip()).strip()
         return super(CurrencyField, self).coerce(value)
 
 
@@ -628,16 +1057,22 @@ class SlugField(CharField):
 
     validators = [validators.validate_slug]
 
+    slug_cache_size = 1000
+
     def __init__(self, fm_attr=None, *args, **kwargs):
         self.slugify = kwargs.pop('slugify', slugify)
         self.auto = kwargs.pop('auto', True)
-        return super(SlugField, self)\
-            .__init__(fm_attr=fm_attr, *args, **kwargs)
+        super(SlugField, self).__init__(fm_attr=fm_attr, *args, **kwargs)
+        self._slugs = LRUCache(self.slug_cache_size)
 
     def coerce(self, value):
         value = super(SlugField, self).coerce(value)
         if self.auto:
-            value = self.slugify(value)
+            slug = self._slugs.get(value)
+            if slug is None:
+                slug = self.slugify(value)
+                self._slugs.set(value, slug)
+            value = slug
         return value
 
 
@@ -647,7 +1082,7 @@ class GTINField(CharField):
     `GTIN <https://en.wikipedia.org/wiki/Global_Trade_Item_Number>`_.
     '''
 
-    validators = [validate_gtin]
+    validators = [fm_validators.validate_gtin]
 
 
 class URLField(CharField):
@@ -655,7 +1090,7 @@ class URLField(CharField):
     A :py:class:`CharField` that validates it's input is a valid URL.
     '''
 
-    validators = [validators.URLValidator()]
+    validators = [fm_validators.validate_url]
 
 
 class FileField(BaseFileMakerField):
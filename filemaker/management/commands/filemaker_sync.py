@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from filemaker.sync import Checkpoint, sweep_deletions, sync_manager
+from filemaker.utils import import_string
+
+
+# The command's options, as the arguments to optparse's make_option or
+# argparse's add_argument
+OPTIONS = (
+    (('--resume',), {
+        'action': 'store_true', 'dest': 'resume', 'default': False,
+        'help': 'Resume from the last checkpoint of an interrupted sync.'}),
+    (('--page-size',), {
+        'type': int, 'dest': 'page_size', 'default': None,
+        'help': 'The number of records to fetch from FileMaker at a time.'}),
+    (('--batch-size',), {
+        'type': int, 'dest': 'batch_size', 'default': None,
+        'help': 'The number of records to commit per transaction.'}),
+    (('--sweep',), {
+        'action': 'store_true', 'dest': 'sweep', 'default': False,
+        'help': 'Delete Django instances no longer present in FileMaker.'}),
+    (('--checkpoint',), {
+        'dest': 'checkpoint', 'default': None,
+        'help': 'The checkpoint name, defaults to the model path.'}),
+    (('--lenient',), {
+        'action': 'store_true', 'dest': 'lenient', 'default': False,
+        'help': 'Skip records with invalid values and report them.'}),
+)
+
+
+class Command(BaseCommand):
+
+    args = '<app.module.FileMakerModel>'
+    help = 'Syncs all records for a FileMakerModel to its Django model.'
+    # Django < 1.8 parses the options with optparse
+    option_list = getattr(BaseCommand, 'option_list', ()) + tuple(
+        make_option(*flags, **kwargs) for flags, kwargs in OPTIONS)
+
+    def add_arguments(self, parser):
+        # Django >= 1.8 parses the options with argparse
+        parser.add_argument('args', nargs='*')
+        for flags, kwargs in OPTIONS:
+            parser.add_argument(*flags, **kwargs)
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('You must specify a FileMakerModel.')
+        try:
+            cls = import_string(args[0])
+        except (ImportError, AttributeError, ValueError):
+            raise CommandError('Could not import {0}'.format(args[0]))
+        if options['sweep'] and not cls._meta['pk_name']:
+            raise CommandError(
+                '--sweep requires {0} to have a pk_name'.format(args[0]))
+        checkpoint = Checkpoint(options['checkpoint'] or args[0])
+        manager = cls.objects.all()
+        if options['lenient']:
+            manager = manager.lenient()
+        report = sync_manager(
+            manager,
+            page_size=options['page_size'],
+            batch_size=options['batch_size'],
+            checkpoint=checkpoint,
+            resume=options['resume'],
+        )
+        for instance, error in report.errors:
+            self.stderr.write('{0!r}: {1}\n'.format(instance, error))
+        self.stdout.write('Synced {0} records, {1} failed.\n'.format(
+            report.synced, len(report.errors)))
+        if manager.load_errors:
+            self.stderr.write(manager.load_errors.report() + '\n')
+        if options['sweep']:
+            missing = sweep_deletions(
+                cls.objects.all(),
+                page_size=options['page_size'],
+                batch_size=options['batch_size'],
+            )
+            self.stdout.write('Deleted {0} records.\n'.format(len(missing)))
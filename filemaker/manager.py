@@ -2,15 +2,25 @@
 from __future__ import unicode_literals
 
 import copy
+import functools
 import re
+import weakref
+from collections import OrderedDict
 
 import requests
-from django.http import QueryDict
+from django.core import signing
+from django.core.exceptions import NON_FIELD_ERRORS
 from django.utils import six
+from django.utils.encoding import force_text
+from django.utils.http import urlencode
 from urlobject import URLObject
 
-from filemaker.exceptions import FileMakerConnectionError
-from filemaker.parser import FMXMLObject
+from filemaker.conf import settings
+from filemaker.exceptions import (FileMakerConnectionError,
+                                  FileMakerValidationError)
+from filemaker.fields import CoercionContext
+from filemaker.parser import FMDocument, FMRecordIDs, FMXMLObject
+from filemaker.utils import batches
 
 
 OPERATORS = {
@@ -26,6 +36,150 @@ OPERATORS = {
 }
 
 
+# Characters that are operators in FileMaker find requests
+FIND_ESCAPE_RE = re.compile(r'([\\@#*"~=!<>?/])')
+
+# The resolved lookups for each model class
+_lookups = weakref.WeakKeyDictionary()
+
+
+def _cached_lookup(method):
+    # Memoizes a manager method resolving a lookup on the manager's model,
+    # as the fields of a model don't change once the class is created
+    @functools.wraps(method)
+    def wrapper(self, lookup):
+        cache = _lookups.setdefault(self.cls, {})
+        key = (method.__name__, lookup)
+        try:
+            return cache[key]
+        except KeyError:
+            result = cache[key] = method(self, lookup)
+            return result
+    return wrapper
+
+
+class QueryParams(object):
+    '''
+    An immutable, ordered collection of the URL parameters for a FileMaker
+    query. A parameter may have several values, as with a
+    :py:class:`django.http.QueryDict`, but rather than changing the
+    parameters in place the ``*_param`` methods return a new instance, so a
+    manager can be cloned without copying its parameters and the same
+    parameters can safely be shared between managers and threads.
+
+    .. py:attribute:: key
+
+        A hashable, canonical form of the parameters that doesn't depend on
+        the order in which different parameters were added, suitable for use
+        as a cache key. Instances with the same key are equal.
+    '''
+
+    def __init__(self, items=()):
+        self._items = tuple(items)
+        self._lists = OrderedDict()
+        for name, value in self._items:
+            self._lists.setdefault(name, []).append(value)
+        self.key = tuple(sorted(
+            ((name, force_text(value)) for name, value in self._items),
+            key=lambda item: item[0]))
+
+    def __repr__(self):
+        return '<QueryParams: {0!r}>'.format(list(self._items))
+
+    def __eq__(self, other):
+        return isinstance(other, QueryParams) and self.key == other.key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __contains__(self, name):
+        return name in self._lists
+
+    def __iter__(self):
+        return iter(self._lists)
+
+    def __len__(self):
+        return len(self._lists)
+
+    def __getitem__(self, name):
+        try:
+            return self._lists[name][-1]
+        except KeyError:
+            raise KeyError(name)
+
+    def get(self, name, default=None):
+        '''
+        Returns the last value of the parameter ``name``, or ``default`` if
+        it isn't set.
+        '''
+        values = self._lists.get(name)
+        return values[-1] if values else default
+
+    def getlist(self, name):
+        '''
+        Returns a list of all of the values of the parameter ``name``.
+        '''
+        return list(self._lists.get(name, []))
+
+    def keys(self):
+        return list(self._lists)
+
+    def items(self):
+        return [(name, values[-1]) for name, values in self._lists.items()]
+
+    def lists(self):
+        return [(name, list(values)) for name, values in self._lists.items()]
+
+    def copy(self):
+        # Instances are immutable, so there's nothing to copy
+        return self
+
+    def set_param(self, name, value):
+        '''
+        Returns new parameters with ``name`` set to ``value``, replacing any
+        existing values.
+        '''
+        return QueryParams(
+            [item for item in self._items if item[0] != name]
+            + [(name, value)])
+
+    def add_param(self, name, value):
+        '''
+        Returns new parameters with ``value`` added to the values of
+        ``name``.
+        '''
+        return QueryParams(self._items + ((name, value),))
+
+    def add_params(self, params):
+        '''
+        Returns new parameters with the values in the dictionary ``params``
+        added, like :py:meth:`django.http.QueryDict.update`.
+        '''
+        if not params:
+            return self
+        return QueryParams(self._items + tuple(params.items()))
+
+    def del_param(self, *names):
+        '''
+        Returns new parameters without any of the values of ``names``.
+        '''
+        if not any(name in self._lists for name in names):
+            return self
+        return QueryParams(
+            item for item in self._items if item[0] not in names)
+
+    def urlencode(self):
+        return urlencode([(name, value)
+                          for name, values in self._lists.items()
+                          for value in values])
+
+
+DEFAULT_PARAMS = QueryParams([('-max', '50')])
+
+
 class RawManager(object):
     '''
     The raw manager allows you to query the FileMaker web interface.
@@ -51,27 +205,42 @@ class RawManager(object):
         :param response_layout: (*Optional*) The layout to use (sets the
             ``-lay.response`` parameter).
         '''
-        self.url = URLObject(url).without_auth()
-        self.url = self.url.with_path(
-            self.url.path or '/fmi/xml/fmresultset.xml')
-        self.auth = URLObject(url).auth
-        self.params = QueryDict('', mutable=True)
-        self.dbparams = QueryDict('', mutable=True)
-        self.dbparams.update({
-            '-db': db,
-            '-lay': layout,
-        })
-        if response_layout:
-            self.dbparams['-lay.response'] = response_layout
-        self.params['-max'] = '50'
+        # Managers for a model share the parsed URL, auth and database params
+        cache = self._connection_cache()
+        key = (url, db, layout, response_layout)
+        connection = cache.get(key) if cache is not None else None
+        if connection is None:
+            url = URLObject(url)
+            base_url = url.without_auth()
+            base_url = base_url.with_path(
+                base_url.path or '/fmi/xml/fmresultset.xml')
+            dbparams = QueryParams([('-db', db), ('-lay', layout)])
+            if response_layout:
+                dbparams = dbparams.set_param('-lay.response', response_layout)
+            connection = (base_url, url.auth, dbparams)
+            if cache is not None:
+                cache.set(key, connection)
+        self.url, self.auth, self.dbparams = connection
+        self.params = DEFAULT_PARAMS
+        self._parse_fields = None
+        self._skip_related = None
 
     def __repr__(self):
         return '<RawManager: {0} {1} {2}>'.format(
             self.url, self.dbparams, self.params)
 
+    def _connection_cache(self):
+        return None
+
     def _clone(self):
+        # The params are immutable so can be shared with the clone
         return copy.copy(self)
 
+    def _with_params(self, **kwargs):
+        mgr = self._clone()
+        mgr.params = self.params.add_params(kwargs)
+        return mgr
+
     def set_script(self, name, option=None):
         '''
         Sets the name of the filemaker script to use
@@ -83,7 +252,7 @@ class RawManager(object):
         key = '-script'
         if option in ('prefind', 'presort'):
             key = '{0}.{1}'.format(key, option)
-        mgr.params[key] = name
+        mgr.params = mgr.params.set_param(key, name)
         return mgr
 
     def set_record_id(self, recid):
@@ -93,7 +262,7 @@ class RawManager(object):
         :param recid: The record ID to set.
         '''
         mgr = self._clone()
-        mgr.params['-recid'] = recid
+        mgr.params = mgr.params.set_param('-recid', recid)
         return mgr
 
     def set_modifier_id(self, modid):
@@ -103,7 +272,7 @@ class RawManager(object):
         :param modid: The modifier ID to set.
         '''
         mgr = self._clone()
-        mgr.params['-modid'] = modid
+        mgr.params = mgr.params.set_param('-modid', modid)
         return mgr
 
     def set_logical_operator(self, op):
@@ -115,29 +284,69 @@ class RawManager(object):
         '''
         mgr = self._clone()
         if op in ('and', 'or'):
-            mgr.params['-lop'] = op
+            mgr.params = mgr.params.set_param('-lop', op)
         return mgr
 
     def set_group_size(self, max):
         '''
         Set the group size to return from FileMaker using the ``-max``.
 
-        This is defaulted to 50 when the manager is initialized.
+        This is defaulted to 50 when the manager is initialized. Returns a new
+        manager, the manager this is called on is not changed.
 
         :param integer max: The number of records to return.
         '''
-        self.params['-max'] = max
-        return self
+        mgr = self._clone()
+        mgr.params = mgr.params.set_param('-max', max)
+        return mgr
 
     def set_skip_records(self, skip):
         '''
         The number of records to skip when retrieving records from FileMaker
-        using the ``-skip`` parameter.
+        using the ``-skip`` parameter. Returns a new manager, the manager this
+        is called on is not changed.
 
         :param integer skip: The number of records to skip.
         '''
-        self.params['-skip'] = skip
-        return self
+        mgr = self._clone()
+        mgr.params = mgr.params.set_param('-skip', skip)
+        return mgr
+
+    def set_related_sets_max(self, max):
+        '''
+        Sets the maximum number of portal records to return for each record
+        using the ``-relatedsets.max`` parameter.
+
+        :param max: The number of portal records, or ``all``.
+        '''
+        mgr = self._clone()
+        mgr.params = mgr.params.set_param('-relatedsets.max', max)
+        return mgr
+
+    def set_related_sets_filter(self, filter):
+        '''
+        Sets the ``-relatedsets.filter`` parameter, which controls whether
+        the portal records returned are limited by the settings of the portal
+        on the layout.
+
+        :param filter: Must be one of ``layout`` or ``none``.
+        '''
+        mgr = self._clone()
+        if filter in ('layout', 'none'):
+            mgr.params = mgr.params.set_param('-relatedsets.filter', filter)
+        return mgr
+
+    def skip_related_sets(self, *tables):
+        '''
+        Skips the portal records for the given related tables when parsing
+        the response, so that they are missing from the results.
+
+        :param \*tables: The names of the related tables to skip.
+        '''
+        mgr = self._clone()
+        mgr._skip_related = frozenset(tables) | (
+            self._skip_related or frozenset())
+        return mgr
 
     def add_db_param(self, field, value, op=None):
         '''
@@ -152,9 +361,9 @@ class RawManager(object):
         :param op: (*Optional*) The operator to use for this query.
         '''
         mgr = self._clone()
-        mgr.params.appendlist(field, value)
+        mgr.params = mgr.params.add_param(field, value)
         if op:
-            mgr.params.appendlist('{0}.op'.format(field), op)
+            mgr.params = mgr.params.add_param('{0}.op'.format(field), op)
         return mgr
 
     def add_sort_param(self, field, order='ascend', priority=0):
@@ -168,8 +377,9 @@ class RawManager(object):
             this sort in if multiple sort fields are specified.
         '''
         mgr = self._clone()
-        mgr.params['-sortfield.{0}'.format(priority)] = field
-        mgr.params['-sortorder.{0}'.format(priority)] = order
+        mgr.params = mgr.params.set_param(
+            '-sortfield.{0}'.format(priority), field).set_param(
+            '-sortorder.{0}'.format(priority), order)
         return mgr
 
     def find(self, **kwargs):
@@ -181,8 +391,7 @@ class RawManager(object):
             passed directly into the URL parameters.
         :rtype: :py:class:`filemaker.parser.FMXMLObject`
         '''
-        self.params.update(kwargs)
-        return self._commit('find')
+        return self._with_params(**kwargs)._commit('find')
 
     def find_all(self, **kwargs):
         '''
@@ -192,8 +401,7 @@ class RawManager(object):
         :param \**kwargs: Any additional URL parameters.
         :rtype: :py:class:`filemaker.parser.FMXMLObject`
         '''
-        self.params.update(kwargs)
-        return self._commit('findall')
+        return self._with_params(**kwargs)._commit('findall')
 
     def edit(self, **kwargs):
         '''
@@ -207,8 +415,7 @@ class RawManager(object):
         :param \**kwargs: Any additional parameters to pass into the URL.
         :rtype: :py:class:`filemaker.parser.FMXMLObject`
         '''
-        self.params.update(kwargs)
-        return self._commit('edit')
+        return self._with_params(**kwargs)._commit('edit')
 
     def new(self, **kwargs):
         '''
@@ -218,8 +425,7 @@ class RawManager(object):
         :param \**kwargs: Any additional parameters to pass into the URL.
         :rtype: :py:class:`filemaker.parser.FMXMLObject`
         '''
-        self.params.update(kwargs)
-        return self._commit('new')
+        return self._with_params(**kwargs)._commit('new')
 
     def delete(self, **kwargs):
         '''
@@ -233,19 +439,58 @@ class RawManager(object):
         :param \**kwargs: Any additional parameters to pass into the URL.
         :rtype: :py:class:`filemaker.parser.FMXMLObject`
         '''
-        self.params.update(kwargs)
-        return self._commit('delete')
+        return self._with_params(**kwargs)._commit('delete')
+
+    def find_any(self, field, values, **kwargs):
+        '''
+        Performs a compound find using the ``-findquery`` command, returning
+        the records where ``field`` exactly matches any of ``values``. This
+        method internally calls ``_commit`` and is not chainable.
+
+        :param field: The FileMaker field to search on.
+        :param values: The values to match.
+        :param \**kwargs: Any additional URL parameters.
+        :rtype: :py:class:`filemaker.parser.FMXMLObject`
+        '''
+        queries = []
+        for i, value in enumerate(values, 1):
+            queries.append('(q{0})'.format(i))
+            kwargs['-q{0}'.format(i)] = field
+            kwargs['-q{0}.value'.format(i)] = '=={0}'.format(
+                FIND_ESCAPE_RE.sub(r'\\\1', force_text(value)))
+        kwargs['-query'] = ';'.join(queries)
+        return self._with_params(**kwargs)._commit('findquery')
+
+    def find_ids(self, id_field=None, **kwargs):
+        '''
+        Performs the -find command, but only parses the ids of the records
+        returned, skipping over all other field data. This method internally
+        calls ``_request`` and is not chainable.
+
+        :param id_field: (*Optional*) The FileMaker field holding the id to
+            return. If not given the ``RECORDID`` of each record is returned.
+        :param \**kwargs: Any additional fields to search on, which will be
+            passed directly into the URL parameters.
+        :rtype: :py:class:`filemaker.parser.FMRecordIDs`
+        '''
+        return FMRecordIDs(self._with_params(**kwargs)._request('find'),
+                           id_field=id_field)
 
     def _commit(self, action):
-        if 'RECORDID' in self.params and not '-recid' in self.params:
-            self.params['-recid'] = self.params['RECORDID']
-            del self.params['RECORDID']
-        if 'MODID' in self.params and not '-modid' in self.params:
-            self.params['-modid'] = self.params['MODID']
-            del self.params['MODID']
+        return FMXMLObject(self._request(action), fields=self._parse_fields,
+                           skip_related=self._skip_related)
+
+    def _request(self, action):
+        params = self.params
+        if 'RECORDID' in params and not '-recid' in params:
+            params = params.set_param(
+                '-recid', params['RECORDID']).del_param('RECORDID')
+        if 'MODID' in params and not '-modid' in params:
+            params = params.set_param(
+                '-modid', params['MODID']).del_param('MODID')
         data = '&'.join([
             self.dbparams.urlencode(),
-            self.params.urlencode(),
+            params.urlencode(),
             '-{0}'.format(action),
         ])
         try:
@@ -253,7 +498,71 @@ class RawManager(object):
             resp.raise_for_status()
         except requests.exceptions.RequestException as e:
             raise FileMakerConnectionError(e)
-        return FMXMLObject(resp.content)
+        return resp.content
+
+
+def _replace_attr(doc, path, value):
+    # Returns a copy of the FMDocument ``doc`` with the value at ``path``
+    # replaced, copying any intermediate documents rather than changing them
+    table = getattr(doc, '_table', None)
+    doc = FMDocument(doc)
+    doc._set_table(table)
+    if len(path) == 1:
+        doc[path[0]] = value
+    else:
+        doc[path[0]] = _replace_attr(doc.get(path[0]) or {}, path[1:], value)
+    return doc
+
+
+class LoadErrors(object):
+    '''
+    Collects the validation errors for records that could not be loaded by a
+    :py:meth:`Manager.lenient` manager.
+
+    .. py:attribute:: loaded
+
+        The number of records that were loaded successfully.
+
+    .. py:attribute:: errors
+
+        A dictionary mapping each failed record's ``RECORDID`` (or its
+        position in the result set if it has none) to a dictionary of field
+        names to the :py:exc:`filemaker.exceptions.FileMakerValidationError`
+        raised for that field.
+    '''
+
+    def __init__(self):
+        self.loaded = 0
+        self.errors = OrderedDict()
+
+    def __len__(self):
+        return len(self.errors)
+
+    def __repr__(self):
+        return '<LoadErrors: {0} loaded, {1} failed>'.format(
+            self.loaded, len(self.errors))
+
+    def add(self, record, field_name, error):
+        self.errors.setdefault(record, {})[field_name] = error
+
+    def report(self, examples=3):
+        '''
+        Returns a summary of the errors, with the number of failures for each
+        field and up to ``examples`` example messages per field.
+        '''
+        by_field = {}
+        for record, field_errors in self.errors.items():
+            for field_name, error in field_errors.items():
+                by_field.setdefault(field_name, []).append((record, error))
+        lines = ['{0} of {1} records failed to load'.format(
+            len(self.errors), self.loaded + len(self.errors))]
+        for field_name, failures in sorted(by_field.items()):
+            lines.append('  {0}: {1} errors'.format(
+                field_name, len(failures)))
+            for record, error in failures[:examples]:
+                lines.append('    record {0}: {1}'.format(
+                    record, '; '.join(error.messages)))
+        return '\n'.join(lines)
 
 
 class Manager(RawManager):
@@ -280,17 +589,189 @@ class Manager(RawManager):
         self.cls = cls
         super(Manager, self).__init__(**self.cls._meta.get('connection'))
         self._result_cache = None
+        self._instance_cache = None
         self._fm_data = None
+        self._columnar = False
+        self._validate = True
+        self._lazy = False
+        self._loaded_fields = None
+        self._prefetch = ()
+        self._group_by = ()
+        self._response_layout = self.dbparams.get('-lay.response')
+        self.load_errors = None
+
+    def _connection_cache(self):
+        return self.cls._meta.get('connection_cache')
 
     def __iter__(self):
-        return self.iterator()
+        if self._instance_cache is None:
+            self._instance_cache = list(self.iterator())
+        return iter(self._instance_cache)
 
     def iterator(self):
-        if not self._result_cache:
-            self._result_cache = \
-                self.preprocess_resultset(self._get_fm_data().resultset)
-        for result in self._result_cache:
-            yield self.cls(result)
+        '''
+        Iterates over the results, creating a new model instance for each
+        record. Unlike iterating over the manager itself, the instances are
+        not cached, so iterating again creates them again.
+        '''
+        self._get_results()
+        context = CoercionContext(self._get_fm_data().database,
+                                  validate=self._validate, lazy=self._lazy,
+                                  prefetch=self._prefetch)
+        if self._loaded_fields is not None and (
+                self._lazy or self.load_errors is not None):
+            for index, result in enumerate(self._result_cache):
+                with context:
+                    instance = self._load_projected(index, result, context)
+                if instance is not None:
+                    yield instance
+            return
+        if self._loaded_fields is not None or (
+                self._columnar and self.load_errors is None
+                and not self._lazy):
+            with context:
+                instances = self._load_columns(
+                    self._result_cache, self._loaded_fields)
+            for instance in instances:
+                yield instance
+            return
+        for index, result in enumerate(self._result_cache):
+            with context:
+                if self.load_errors is None:
+                    instance = self.cls(result)
+                else:
+                    instance = self._load_lenient(index, result)
+            if instance is not None:
+                yield instance
+
+    def _get_results(self):
+        if self._result_cache is None:
+            results = self.preprocess_resultset(self._get_fm_data().resultset)
+            fetched = {}
+            for field_name in self._prefetch:
+                results = self._prefetch_field(results, field_name, fetched)
+            self._result_cache = results
+        return self._result_cache
+
+    def _prefetch_field(self, results, field_name, fetched):
+        # Replaces the keys held by the field in each record with the related
+        # records, fetched in batches from the related model's layout
+        from filemaker.base import deep_getattr
+        from filemaker.fields import ModelListField
+        field = self.cls._fields[field_name]
+        rel_manager = field.model._default_manager.all()
+        to_field = getattr(field, 'to_field', None) or \
+            field.model._meta['pk_name']
+        key_attr = field.model._fields[to_field].fm_attr
+        many = isinstance(field, ModelListField)
+        keys_by_result = []
+        for result in results:
+            keys = deep_getattr(result, field.fm_attr)
+            if not keys:
+                keys = []
+            elif isinstance(keys, six.string_types):
+                keys = keys.splitlines() if many else [keys]
+            keys_by_result.append([force_text(key).strip() for key in keys
+                                   if key is not None])
+        # Fields relating to the same model share the records fetched
+        related = fetched.setdefault((field.model, to_field), {})
+        wanted = set(key for keys in keys_by_result for key in keys if key)
+        wanted.difference_update(related)
+        fm_field = rel_manager._resolve_fm_field(to_field)
+        for batch in batches(sorted(wanted),
+                             settings.FILEMAKER_PREFETCH_BATCH_SIZE):
+            mgr = rel_manager.set_group_size('all')
+            for record in mgr.find_any(fm_field, batch).resultset:
+                key = deep_getattr(record, key_attr)
+                if key is not None:
+                    related[force_text(key).strip()] = record
+        # Remember the keys that weren't found, so they aren't fetched again
+        for key in wanted:
+            related.setdefault(key, None)
+        prefetched = []
+        for result, keys in zip(results, keys_by_result):
+            records = [related[key] for key in keys
+                       if related.get(key) is not None]
+            if not many:
+                records = records[0] if records else None
+            prefetched.append(
+                _replace_attr(result, field.fm_attr.split('.'), records))
+        return prefetched
+
+    def _load_lenient(self, index, result):
+        from filemaker.base import deep_getattr
+        try:
+            instance = self.cls(result)
+        except FileMakerValidationError as error:
+            # Check every field so that all of the record's errors are known
+            record = getattr(result, 'RECORDID', None)
+            record = index if record is None else record
+            for field_name, field in self.cls._fields.items():
+                try:
+                    field._clean(deep_getattr(result, field.fm_attr))
+                except FileMakerValidationError as e:
+                    self.load_errors.add(record, field_name, e)
+            if record not in self.load_errors.errors:
+                self.load_errors.add(record, NON_FIELD_ERRORS, error)
+            return None
+        self.load_errors.loaded += 1
+        return instance
+
+    def _load_projected(self, index, result, context):
+        # Builds an instance with only the loaded fields of a lazy or
+        # lenient manager, which can't be coerced a column at a time
+        from filemaker.base import deep_getattr
+        loaded = [(name, field) for name, field in self.cls._fields.items()
+                  if name in self._loaded_fields]
+        if self._lazy:
+            instance = self.cls._from_coerced(
+                result, {}, self._loaded_fields)
+            eager = context.eager()
+            for field_name, field in loaded:
+                instance._fields[field_name]._defer(
+                    deep_getattr(result, field.fm_attr), eager)
+            return instance
+        values = {}
+        record = getattr(result, 'RECORDID', None)
+        record = index if record is None else record
+        for field_name, field in loaded:
+            try:
+                values[field_name] = field._clean(
+                    deep_getattr(result, field.fm_attr))
+            except FileMakerValidationError as e:
+                self.load_errors.add(record, field_name, e)
+        if len(values) < len(loaded):
+            return None
+        self.load_errors.loaded += 1
+        return self.cls._from_coerced(result, values, self._loaded_fields)
+
+    def _load_columns(self, results, field_names=None):
+        from filemaker.base import deep_getattr, get_identity_map
+        # Instances with only some of their fields aren't shared
+        identity_map = get_identity_map() if field_names is None else None
+        instances = [identity_map.get(self.cls, result)
+                     if identity_map is not None else None
+                     for result in results]
+        pending = [result for result, instance in zip(results, instances)
+                   if instance is None]
+        columns = []
+        for field_name, field in self.cls._fields.items():
+            if field_names is not None and field_name not in field_names:
+                continue
+            values = [deep_getattr(result, field.fm_attr)
+                      for result in pending]
+            columns.append((field_name, field.coerce_many(values)))
+        j = 0
+        for i, result in enumerate(results):
+            if instances[i] is None:
+                instances[i] = self.cls._from_coerced(
+                    result,
+                    dict((name, values[j]) for name, values in columns),
+                    field_names)
+                j += 1
+                if identity_map is not None:
+                    identity_map.add(self.cls, result, instances[i])
+        return instances
 
     def __len__(self):
         return len(self._get_fm_data().resultset)
@@ -303,16 +784,86 @@ class Manager(RawManager):
                 or (isinstance(k, slice) and (k.start is None or k.start >= 0)
                     and (k.stop is None or k.stop >= 0))), \
             'Negative indexing is not supported.'
+        if self._fm_data is not None:
+            return list(self)[k]
+        # Indexes and slices are both relative to any records already skipped
+        skip = int(self.params.get('-skip') or 0)
         if isinstance(k, slice):
-            if k.start:
-                mgr = mgr.set_skip_records(k.start)
-            if k.stop:
-                mgr = mgr.set_group_size(k.stop - (k.start or 0))
-        return list(mgr)[k]
+            start = k.start or 0
+            if k.stop is not None and k.stop <= start:
+                return []
+            if start:
+                mgr = mgr.set_skip_records(skip + start)
+            if k.stop is not None:
+                mgr = mgr.set_group_size(k.stop - start)
+            # The records fetched are already limited to the slice
+            return list(mgr)[::k.step]
+        # Fetch just the one record rather than the whole group
+        try:
+            if k >= int(self.params['-max']):
+                raise IndexError('Manager index out of range')
+        except (KeyError, ValueError):
+            pass
+        mgr = self.set_skip_records(skip + k).set_group_size(1)
+        results = list(mgr)
+        if not results:
+            raise IndexError('Manager index out of range')
+        return results[0]
+
+    def first(self):
+        '''
+        Returns the first result, fetching only that record, or ``None`` if
+        there are no results. If the manager has no ordering the results are
+        ordered by the model's ``ordering`` or ``pk_name``.
+        '''
+        mgr = self
+        if not self._sort_params():
+            ordering = self.cls._meta['ordering'] or \
+                self.cls._meta['pk_name']
+            if ordering:
+                mgr = mgr.order_by(ordering)
+        try:
+            return mgr[0]
+        except IndexError:
+            return None
+
+    def last(self):
+        '''
+        Returns the last result, fetching only that record, or ``None`` if
+        there are no results. The manager's ordering is reversed to find it,
+        or if it has none the model's ``ordering`` or ``pk_name`` is used.
+        '''
+        sort_params = self._sort_params()
+        if sort_params:
+            mgr = self._clone()
+            for key in sort_params:
+                order_key = key.replace('-sortfield', '-sortorder', 1)
+                mgr.params = mgr.params.set_param(
+                    order_key, 'ascend'
+                    if self.params.get(order_key) == 'descend' else 'descend')
+        else:
+            ordering = self.cls._meta['ordering'] or \
+                self.cls._meta['pk_name']
+            if not ordering:
+                raise ValueError('last() requires an ordering')
+            mgr = self.order_by(
+                ordering[1:] if ordering.startswith('-') else '-' + ordering)
+        mgr.params = mgr.params.del_param('-skip')
+        try:
+            return mgr[0]
+        except IndexError:
+            return None
+
+    def _sort_params(self):
+        return [key for key in self.params if key.startswith('-sortfield')]
 
     def __repr__(self):
+        # Never query FileMaker just to describe the manager
+        if self._fm_data is None:
+            return '<{0} query: {1}>'.format(
+                self.cls.__name__, self.params.urlencode())
         return '<{0} query with {1} records...>'.format(
-            self.cls.__name__, len(self))
+            self.cls.__name__, len(self._fm_data.resultset))
 
     def _get_fm_data(self):
         if self._fm_data is None:
@@ -322,14 +873,14 @@ class Manager(RawManager):
     def _clone(self):
         mgr = super(Manager, self)._clone()
         mgr._result_cache = None
+        mgr._instance_cache = None
         mgr._fm_data = None
         return mgr
 
-    def _resolve_fm_field(self, field):
-        from filemaker.fields import ModelField
+    @_cached_lookup
+    def _resolve_fields(self, field):
         parts = field.split('__')
-        fm_attr_path = []
-        klass = self.cls
+        resolved_fields = []
         resolved_field = None
         for part in parts:
             try:
@@ -339,12 +890,54 @@ class Manager(RawManager):
             resolved_field = klass._fields.get(part)
             if resolved_field is None:
                 raise ValueError('Cound not resolve field: {0}'.format(field))
+            resolved_fields.append(resolved_field)
+        return tuple(resolved_fields)
+
+    @_cached_lookup
+    def _resolve_fm_field(self, field):
+        from filemaker.fields import ModelField
+        fm_attr_path = []
+        for resolved_field in self._resolve_fields(field):
             path = resolved_field.fm_attr.replace('.', '::')
             if not path == '+self' and not isinstance(
                     resolved_field, ModelField):
                 fm_attr_path.append(path)
         return '::'.join(fm_attr_path)
 
+    @_cached_lookup
+    def _resolve_value_field(self, field):
+        '''
+        Returns the attribute path of ``field`` within a record from the
+        resultset, for use with ``deep_getattr``, and the field to coerce its
+        values with.
+        '''
+        from filemaker.fields import ModelField
+        resolved_fields = self._resolve_fields(field)
+        attrs = []
+        for resolved_field in resolved_fields[:-1]:
+            if not isinstance(resolved_field, ModelField):
+                raise ValueError(
+                    'Cannot get values across a list: {0}'.format(field))
+            if not resolved_field.fm_attr == '+self':
+                attrs.append(resolved_field.fm_attr)
+        resolved_field = resolved_fields[-1]
+        if hasattr(resolved_field, 'model'):
+            raise ValueError(
+                'Cannot get values for a related model: {0}'.format(field))
+        attrs.append(resolved_field.fm_attr)
+        return '.'.join(attrs), resolved_field
+
+    @_cached_lookup
+    def _resolve_lookup(self, lookup):
+        # Returns the FileMaker field and operator for a filter argument
+        operator = 'eq'
+        for op, code in OPERATORS.items():
+            if lookup.endswith('__{0}'.format(op)):
+                lookup = lookup[:-len(op) - 2]
+                operator = code
+                break
+        return self._resolve_fm_field(lookup), operator
+
     def preprocess_resultset(self, resultset):
         '''
         This is a hook you can override on a manager to pre-process a resultset
@@ -361,6 +954,450 @@ class Manager(RawManager):
         '''
         return self._clone()
 
+    def columnar(self):
+        '''
+        Returns a clone of the manager that builds model instances column by
+        column, coercing all the values for each field in one go using the
+        field's ``coerce_many`` method, rather than record by record. This is
+        faster for large result sets, but bypasses any custom ``__init__`` on
+        the model class.
+        '''
+        mgr = self._clone()
+        mgr._columnar = True
+        return mgr
+
+    def trusted(self):
+        '''
+        Returns a clone of the manager that does not run field validators
+        (e.g. the email and URL validators) when building model instances.
+        Values are still coerced to the right types. Use this for bulk reads
+        of data that is known to be valid.
+        '''
+        mgr = self._clone()
+        mgr._validate = False
+        return mgr
+
+    def only(self, *fields):
+        '''
+        Returns a clone of the manager that only loads the given fields, other
+        fields are left at their default value. Only the FileMaker fields and
+        portals needed for these fields are parsed from the response, and if
+        the model ``meta`` has a ``response_layouts`` entry containing all of
+        the fields that layout is used for the response. Instances are built
+        as with :py:meth:`columnar`, unless the manager is :py:meth:`lazy`
+        or :py:meth:`lenient`, and their ``to_django`` method only
+        writes the loaded fields (the ``pk_name`` field must be one of them).
+
+        :param \*fields: The names of the fields to load. For related fields
+            only the first part of the name is used, e.g. ``only('foo__bar')``
+            loads all of ``foo``.
+        '''
+        return self._project(self._field_roots(fields))
+
+    def defer(self, *fields):
+        '''
+        The opposite of :py:meth:`only`, returns a clone of the manager that
+        loads all but the given fields.
+
+        :param \*fields: The names of the fields not to load.
+        '''
+        loaded = self._loaded_fields
+        if loaded is None:
+            loaded = frozenset(self.cls._fields)
+        return self._project(loaded - self._field_roots(fields))
+
+    def _field_roots(self, fields):
+        names = frozenset(field.split('__', 1)[0] for field in fields)
+        for name in names:
+            if name not in self.cls._fields:
+                raise ValueError('Cound not resolve field: {0}'.format(name))
+        return names
+
+    def _project(self, field_names):
+        mgr = self._clone()
+        mgr._loaded_fields = field_names
+        mgr._parse_fields = frozenset(
+            self._fm_roots(self.cls, field_names))
+        layouts = [
+            (len(layout_fields), layout)
+            for layout, layout_fields
+            in self.cls._meta['response_layouts'].items()
+            if field_names.issubset(layout_fields)
+        ]
+        layout = min(layouts)[1] if layouts else self._response_layout
+        if layout:
+            mgr.dbparams = mgr.dbparams.set_param('-lay.response', layout)
+        else:
+            mgr.dbparams = mgr.dbparams.del_param('-lay.response')
+        return mgr
+
+    def _fm_roots(self, cls, field_names):
+        # The names of the FileMaker fields (or related tables) holding the
+        # data for the given fields of ``cls``
+        from filemaker.fields import ModelField
+        for field_name in field_names:
+            field = cls._fields[field_name]
+            if isinstance(field, ModelField) and field.fm_attr == '+self':
+                for root in self._fm_roots(field.model, field.model._fields):
+                    yield root
+            else:
+                yield field.fm_attr.split('.', 1)[0].split('::', 1)[0]
+
+    def prefetch_related(self, *fields):
+        '''
+        Returns a clone of the manager that fetches the related instances for
+        the given :py:class:`filemaker.fields.ModelField` or
+        :py:class:`filemaker.fields.ModelListField` fields from their own
+        layout, rather than from the parent record. Where the fields'
+        ``fm_attr`` holds the key of the related record (or for a
+        ``ModelListField`` a list of keys, one per line), the keys for each
+        page of results are collected and the related records are fetched
+        in batches of ``FILEMAKER_PREFETCH_BATCH_SIZE`` using
+        :py:meth:`RawManager.find_any`, instead of one request per record.
+
+        The keys are matched against the related model's ``pk_name`` field,
+        or the field named by the field's ``to_field`` attribute if it has
+        one, e.g. ``fields.ModelField('Customer_ID', model=Customer,
+        to_field='code')``.
+
+        :param \*fields: The names of the fields to prefetch.
+        '''
+        for field_name in fields:
+            field = self.cls._fields.get(field_name)
+            if not hasattr(field, 'model') or \
+                    not field.model._meta['connection']:
+                raise ValueError(
+                    '{0} is not a relation to a model with a connection'
+                    .format(field_name))
+        mgr = self._clone()
+        mgr._prefetch = self._prefetch + tuple(
+            field for field in fields if field not in self._prefetch)
+        return mgr
+
+    def keyset_page(self, cursor=None, page_size=None, field=None):
+        '''
+        Returns a page of results using keyset (or seek) pagination, along
+        with a cursor for the next page. Rather than skipping over the
+        records of earlier pages with ``-skip``, which is slow for pages deep
+        into a large found set and unstable when records are added during
+        a scan, the records are sorted by a unique field and each page asks
+        for the records where that field is greater than the last value
+        seen. The cursor is a signed string that can be passed back by API
+        clients.
+
+        :param cursor: (*Optional*) The cursor returned with the previous
+            page. If not given the first page is returned.
+        :param page_size: (*Optional*) The number of records per page,
+            defaults to the manager's current ``-max``.
+        :param field: (*Optional*) The unique field to paginate on, defaults
+            to the model's ``pk_name``. The manager can't already filter on
+            this field, or use the ``or`` logical operator.
+        :returns: A ``(instances, cursor)`` tuple, where the cursor is
+            ``None`` if this is the last page.
+        '''
+        field = field or self.cls._meta['pk_name']
+        if not field:
+            raise ValueError('A unique field is required for keyset '
+                             'pagination')
+        if not self._can_seek(field):
+            raise ValueError('Keyset pagination on {0} is not possible when '
+                             'filtering on it or using the or operator'
+                             .format(field))
+        value = None
+        if cursor is not None:
+            try:
+                state = signing.loads(cursor, salt='filemaker.keyset')
+            except signing.BadSignature:
+                raise ValueError('Invalid cursor')
+            if state.get('field') != field:
+                raise ValueError('The cursor is not for the field {0}'
+                                 .format(field))
+            value = state['value']
+        page_size = int(page_size or self.params.get('-max', 50))
+        mgr = self._keyset_manager(field, value, page_size)
+        instances = list(mgr)
+        value = mgr._keyset_value(field, page_size)
+        if value is None:
+            return instances, None
+        cursor = signing.dumps({'field': field, 'value': value},
+                               salt='filemaker.keyset')
+        return instances, cursor
+
+    def _can_seek(self, field):
+        # Whether pages can be fetched by key on ``field``. The seek condition
+        # is added as a criterion for the field, so the manager mustn't
+        # already have one, and it mustn't be OR'd with the other criteria
+        return self.params.get('-lop') != 'or' and \
+            self._resolve_fm_field(field) not in self.params
+
+    def _keyset_manager(self, field, value, page_size):
+        # The manager for the page of records following the record whose
+        # ``field`` is ``value``, or for the first page if value is None
+        mgr = self.order_by(field)
+        if value is not None:
+            mgr = mgr.filter(**{'{0}__gt'.format(field): value})
+        mgr = mgr.set_group_size(page_size)
+        mgr.params = mgr.params.del_param('-skip')
+        return mgr
+
+    def _keyset_value(self, field, page_size):
+        # The value of ``field`` for the last record of a page fetched with
+        # _keyset_manager, or None if it was the last page
+        from filemaker.base import deep_getattr
+        results = self._get_results()
+        if len(results) < page_size:
+            return None
+        value = deep_getattr(results[-1], self._resolve_value_field(field)[0])
+        if value is None:
+            raise ValueError('Cannot paginate past a record with no value '
+                             'for {0}'.format(field))
+        return force_text(value)
+
+    def keyset_iterator(self, page_size=None, field=None):
+        '''
+        Iterates over all of the results, fetching them a page at a time
+        with :py:meth:`keyset_page`.
+
+        :param page_size: (*Optional*) The number of records per page.
+        :param field: (*Optional*) The unique field to paginate on.
+        '''
+        cursor = None
+        while True:
+            instances, cursor = self.keyset_page(
+                cursor, page_size=page_size, field=field)
+            for instance in instances:
+                yield instance
+            if cursor is None:
+                return
+
+    def lazy(self):
+        '''
+        Returns a clone of the manager whose model instances only coerce each
+        field's value when it is first accessed, as if the model's ``lazy``
+        meta option were set. Takes precedence over :py:meth:`columnar`.
+        '''
+        mgr = self._clone()
+        mgr._lazy = True
+        return mgr
+
+    def lenient(self, errors=None):
+        '''
+        Returns a clone of the manager that skips records with invalid values
+        rather than raising
+        :py:exc:`filemaker.exceptions.FileMakerValidationError`. The errors
+        for each skipped record are collected, by field, on the manager's
+        ``load_errors`` attribute, a :py:class:`LoadErrors` instance.
+
+        :param errors: (*Optional*) A :py:class:`LoadErrors` instance to
+            collect the errors in, e.g. to share one between several pages of
+            results. A new one is created by default.
+        '''
+        mgr = self._clone()
+        mgr.load_errors = errors if errors is not None else LoadErrors()
+        return mgr
+
+    def _values(self, fields):
+        from filemaker.base import deep_getattr
+        if not fields:
+            fields = [name for name, field in self.cls._fields.items()
+                      if not hasattr(field, 'model')]
+        resolved = [self._resolve_value_field(field) for field in fields]
+        results = self._get_results()
+        columns = []
+        with CoercionContext(self._get_fm_data().database,
+                             validate=self._validate):
+            for attr, field in resolved:
+                columns.append(field.coerce_many(
+                    [deep_getattr(result, attr) for result in results]))
+        return fields, columns
+
+    def values(self, *fields):
+        '''
+        Returns an iterator of dictionaries mapping the given field names to
+        their values for each record, rather than model instances. Only the
+        named fields are coerced. Fields of related models can be given in
+        the same way as for :py:meth:`filter`, e.g. ``values('foo__bar')``,
+        as long as they are not across a
+        :py:class:`filemaker.fields.ModelListField`.
+
+        :param \*fields: The field names. All the model's fields other than
+            related models are used if none are given.
+        '''
+        fields, columns = self._values(fields)
+        return (dict(zip(fields, row)) for row in six.moves.zip(*columns))
+
+    def values_list(self, *fields, **kwargs):
+        '''
+        Like :py:meth:`values`, but returns an iterator of tuples of the
+        values in the order the fields are given.
+
+        :param \*fields: The field names.
+        :param flat: (*Optional*) If ``True`` and only one field is given,
+            the values themselves are returned rather than one-tuples.
+        '''
+        flat = kwargs.pop('flat', False)
+        if kwargs:
+            raise TypeError('Unexpected keyword arguments to values_list: '
+                            '{0}'.format(list(kwargs)))
+        if flat and len(fields) != 1:
+            raise TypeError('\'flat\' is not valid when values_list is '
+                            'called with more than one field.')
+        fields, columns = self._values(fields)
+        if flat:
+            return iter(columns[0])
+        return six.moves.zip(*columns)
+
+    def group_by(self, *fields):
+        '''
+        Returns a clone of the manager whose :py:meth:`annotate` method
+        computes aggregates for each distinct combination of values of the
+        given fields.
+
+        :param \*fields: The field names, as for :py:meth:`values`. Related
+            models, lists and files can't be grouped by.
+        '''
+        from filemaker.fields import FileField, ListField, UploadedFileField
+        for field in fields:
+            resolved = self._resolve_fields(field)[-1]
+            # The groups are keyed by the values, so they must be hashable
+            if hasattr(resolved, 'model') or isinstance(
+                    resolved, (ListField, FileField, UploadedFileField)):
+                raise ValueError(
+                    'Cannot group by {0}, a {1}'.format(
+                        field, resolved.__class__.__name__))
+            self._resolve_value_field(field)
+        mgr = self._clone()
+        mgr._group_by = fields
+        return mgr
+
+    def aggregate(self, *args, **kwargs):
+        '''
+        Returns a dictionary of aggregate values computed over all of the
+        records found, e.g.
+        ::
+
+            >>> from filemaker.aggregates import Count, Sum
+            >>> Order.objects.filter(status='paid').aggregate(
+            ...     Count(), total=Sum('amount'))
+            {'count': 120, 'total': Decimal('3421.50')}
+
+        The records are fetched a page of ``FILEMAKER_AGGREGATE_PAGE_SIZE``
+        records at a time, regardless of any ``-skip`` or ``-max`` set on the
+        manager, and only the fields being aggregated are parsed and coerced,
+        so large found sets can be aggregated in constant memory. If the model
+        has a ``pk_name`` the pages are fetched by key, as with
+        :py:meth:`keyset_page`, so records added or deleted while the
+        aggregate is computed don't cause other records to be skipped or
+        counted twice.
+
+        :param \*args: :py:class:`filemaker.aggregates.Aggregate` instances,
+            returned under their default names, e.g. ``amount__sum``.
+        :param \**kwargs: :py:class:`filemaker.aggregates.Aggregate`
+            instances, returned under the keyword names.
+        '''
+        aggregates = self._get_aggregates(args, kwargs)
+        groups = self._reduce((), aggregates)
+        states = groups.get(()) or dict(
+            (alias, aggregate.initial())
+            for alias, aggregate in aggregates.items())
+        return dict((alias, aggregate.result(states[alias]))
+                    for alias, aggregate in aggregates.items())
+
+    def annotate(self, *args, **kwargs):
+        '''
+        Like :py:meth:`aggregate`, but computes the aggregates for each group
+        of records given by :py:meth:`group_by`. Returns a list with a
+        dictionary for each group, holding the values of the grouped fields
+        and the aggregates, in the order the groups were first found, e.g.
+        ::
+
+            >>> Order.objects.group_by('customer').annotate(
+            ...     total=Sum('amount'))
+            [{'customer': 7, 'total': Decimal('54.20')}, ...]
+
+        :param \*args: :py:class:`filemaker.aggregates.Aggregate` instances.
+        :param \**kwargs: :py:class:`filemaker.aggregates.Aggregate`
+            instances.
+        '''
+        if not self._group_by:
+            raise ValueError('annotate() requires the fields to group by to '
+                             'be given with group_by()')
+        aggregates = self._get_aggregates(args, kwargs)
+        annotated = []
+        for key, states in self._reduce(self._group_by, aggregates).items():
+            values = dict(zip(self._group_by, key))
+            for alias, aggregate in aggregates.items():
+                values[alias] = aggregate.result(states[alias])
+            annotated.append(values)
+        return annotated
+
+    def _get_aggregates(self, args, kwargs):
+        aggregates = OrderedDict(
+            (aggregate.default_alias, aggregate) for aggregate in args)
+        aggregates.update(sorted(kwargs.items()))
+        for aggregate in aggregates.values():
+            if aggregate.field is not None:
+                self._resolve_value_field(aggregate.field)
+        return aggregates
+
+    def _reduce(self, group_fields, aggregates):
+        # Reduces the aggregated fields for each group of records, a page at a
+        # time, returning a dictionary of the group values to the state of
+        # each aggregate
+        fields = list(group_fields)
+        for aggregate in aggregates.values():
+            if aggregate.field is not None and aggregate.field not in fields:
+                fields.append(aggregate.field)
+        positions = dict((field, i) for i, field in enumerate(fields))
+        groups = OrderedDict()
+        # The pages are fetched by primary key, so it is loaded too
+        loaded = list(fields)
+        pk_name = self.cls._meta['pk_name']
+        if pk_name and pk_name not in loaded:
+            loaded.append(pk_name)
+        for page in self.only(*loaded)._pages(
+                settings.FILEMAKER_AGGREGATE_PAGE_SIZE):
+            if fields:
+                rows = six.moves.zip(*page._values(fields)[1])
+            else:
+                rows = [()] * len(page._get_results())
+            for row in rows:
+                key = row[:len(group_fields)]
+                try:
+                    states = groups[key]
+                except KeyError:
+                    states = groups[key] = dict(
+                        (alias, aggregate.initial())
+                        for alias, aggregate in aggregates.items())
+                for alias, aggregate in aggregates.items():
+                    value = True if aggregate.field is None \
+                        else row[positions[aggregate.field]]
+                    states[alias] = aggregate.add(states[alias], value)
+        return groups
+
+    def _pages(self, page_size):
+        # Yields a manager for each page of the results. Pages are fetched by
+        # key, as with keyset_page, so records added or deleted during the
+        # scan don't shift the later pages. Models without a pk_name, and
+        # managers that can't seek on it, can only be paged with -skip
+        pk_name = self.cls._meta['pk_name']
+        if not pk_name or not self._can_seek(pk_name):
+            skip = 0
+            while True:
+                page = self.set_skip_records(skip).set_group_size(page_size)
+                yield page
+                fetched = len(page._get_results())
+                skip += fetched
+                if fetched < page_size:
+                    return
+        value = None
+        while True:
+            page = self._keyset_manager(pk_name, value, page_size)
+            yield page
+            value = page._keyset_value(pk_name, page_size)
+            if value is None:
+                return
+
     def filter(self, **kwargs):
         '''
         Filter the queryset by model fields. Model field names are passed in as
@@ -417,17 +1454,11 @@ class Manager(RawManager):
         '''
         mgr = self
         for k, v in kwargs.items():
-            operator = 'eq'
-            for op, code in OPERATORS.items():
-                if k.endswith('__{0}'.format(op)):
-                    k = re.sub(r'__{0}$'.format(op), '', k)
-                    operator = code
-                    break
             try:
-                mgr = mgr.add_db_param(
-                    self._resolve_fm_field(k), v, op=operator)
+                fm_field, operator = self._resolve_lookup(k)
             except (KeyError, ValueError):
                 raise ValueError('Invalid filter argument: {0}'.format(k))
+            mgr = mgr.add_db_param(fm_field, v, op=operator)
         return mgr
 
     def get(self, **kwargs):
@@ -435,7 +1466,8 @@ class Manager(RawManager):
         Returns the first item found by filtering the queryset by ``**kwargs``.
         Will raise the ``DoesNotExist`` exception on the managers model class
         if no items are found, however, unlike the Django ORM, will silently
-        return the first result if multiple results are found.
+        return the first result if multiple results are found. Only the one
+        record is fetched from FileMaker.
 
         :param \**kwargs: Field and value queries to be passed to
             :py:meth:`filter`
@@ -461,9 +1493,9 @@ class Manager(RawManager):
         :param \*args: The field names to order by.
         '''
         mgr = self._clone()
-        for key in list(mgr.params.keys()):
-            if key.startswith('-sortfield') or key.startswith('-sortorder'):
-                mgr.params.pop(key)
+        mgr.params = mgr.params.del_param(*[
+            key for key in mgr.params
+            if key.startswith('-sortfield') or key.startswith('-sortorder')])
         i = 0
         for arg in args:
             if arg.startswith('-'):
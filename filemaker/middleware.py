@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from filemaker.base import IdentityMap
+
+
+class IdentityMapMiddleware(object):
+    '''
+    Activates an :py:class:`filemaker.base.IdentityMap` for each request, so
+    that each FileMaker record loaded while handling the request is only made
+    into one instance of each model.
+    '''
+
+    def process_request(self, request):
+        request.filemaker_identity_map = IdentityMap().__enter__()
+
+    def process_response(self, request, response):
+        identity_map = getattr(request, 'filemaker_identity_map', None)
+        if identity_map is not None:
+            identity_map.__exit__(None, None, None)
+            del request.filemaker_identity_map
+        return response
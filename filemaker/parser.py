@@ -2,6 +2,7 @@
 from __future__ import unicode_literals
 
 import re
+from array import array
 from collections import deque
 
 from django.utils.encoding import force_text
@@ -13,15 +14,22 @@ from filemaker.exceptions import FileMakerServerError
 class FMDocument(dict):
     '''
     A dictionary subclass for containing a FileMaker result whose keys can
-    be accessed as attributes.
+    be accessed as attributes. The name of the table a parsed record was read
+    from is kept on its ``_table`` attribute, rather than as a key, so that
+    it isn't taken for one of the record's fields.
     '''
 
+    _table = None
+
     def __getattr__(self, name):
         return self.get(name)
 
     def __setattr__(self, name, value):
         self[name] = value
 
+    def _set_table(self, table):
+        object.__setattr__(self, '_table', table)
+
 
 class XMLNode(object):
 
@@ -64,16 +72,46 @@ class XMLNode(object):
                 return element
 
 
+FIELD_TAGS = frozenset([
+    'field', '{http://www.filemaker.com/xml/fmresultset}field'])
+RELATEDSET_TAGS = frozenset([
+    'relatedset', '{http://www.filemaker.com/xml/fmresultset}relatedset'])
+
+
 class FMXMLTarget(object):
+    '''
+    The default lxml parser target for FileMaker responses.
+
+    :param fields: (*Optional*) If given, only the ``<field>`` elements whose
+        names are in ``fields``, or that start with one of them followed by
+        ``::``, are kept, along with the ``<relatedset>`` elements whose table
+        is in ``fields``. The others are skipped without their data being
+        decoded.
+    :param skip_related: (*Optional*) The names of related tables whose
+        ``<relatedset>`` elements should be skipped.
+    '''
 
-    def __init__(self):
+    def __init__(self, fields=None, skip_related=None):
         # It shouldn't make much difference unless you have massive
         # nested elements in a layout, but a deque should be faster than
         # a list here
         self.stack = deque()
         self.root = None
+        self.fields = fields
+        self.skip_related = skip_related
+        self.skipping = 0
 
     def start(self, name, attrs):
+        if self.skipping:
+            self.skipping += 1
+            return
+        if self.fields is not None and name in FIELD_TAGS and \
+                attrs.get('name', '').split('::', 1)[0] not in self.fields:
+            self.skipping = 1
+            return
+        if name in RELATEDSET_TAGS and self._skip_table(attrs.get('table')):
+            self.skipping = 1
+            return
         element = XMLNode(name, attrs)
         if self.stack:
             parent = self.stack[-1]
@@ -82,10 +120,20 @@ class FMXMLTarget(object):
             self.root = element
         self.stack.append(element)
 
+    def _skip_table(self, table):
+        if self.skip_related is not None and table in self.skip_related:
+            return True
+        return self.fields is not None and table not in self.fields
+
     def end(self, name):
+        if self.skipping:
+            self.skipping -= 1
+            return
         self.stack.pop()
 
     def data(self, content):
+        if self.skipping:
+            return
         content = force_text(content)
         element = self.stack[-1]
         element.text += content
@@ -97,6 +145,7 @@ class FMXMLTarget(object):
         root = self.root
         self.stack = deque()
         self.root = None
+        self.skipping = 0
         return root
 
 
@@ -144,12 +193,21 @@ class FMXMLObject(object):
         The target class used by lxml to parse the XML response from the
         server. By default this is an instance of :py:class:`FMXMLTarget`, but
         this can be overridden in subclasses.
+
+    :param data: The raw XML data returned from FileMaker.
+    :param fields: (*Optional*) The names of the fields to parse, see
+        :py:class:`FMXMLTarget`. Other fields are skipped, and are missing
+        from the records in the ``resultset``.
+    :param skip_related: (*Optional*) The names of related tables whose
+        portal records should be skipped.
     '''
 
     target = FMXMLTarget()
 
-    def __init__(self, data):
+    def __init__(self, data, fields=None, skip_related=None):
         self.data = data
+        self.fields = fields
+        self.skip_related = skip_related
         self.errorcode = -1
         self.product = {}
         self.database = {}
@@ -165,7 +223,11 @@ class FMXMLObject(object):
         return len(self.resultset)
 
     def _parse_xml(self):
-        parser = etree.XMLParser(target=self.target)
+        target = self.target
+        if self.fields is not None or self.skip_related:
+            target = FMXMLTarget(
+                fields=self.fields, skip_related=self.skip_related)
+        parser = etree.XMLParser(target=target)
         try:
             xml_obj = etree.XML(self.data, parser)
             if xml_obj.get_elements('ERRORCODE'):
@@ -193,6 +255,7 @@ class FMXMLObject(object):
             return
         self.product = data.get_element('product').attrs
         self.database = data.get_element('datasource').attrs
+        table = self.database.get('table')
         definitions = data.get_element(
             'metadata').get_elements('field-definition')
         for definition in definitions:
@@ -215,6 +278,7 @@ class FMXMLObject(object):
                     record[field_name] = column_data
             record['RECORDID'] = int(result['record-id'])
             record['MODID'] = int(result['mod-id'])
+            record._set_table(table)
 
             for sub_node in result.get_elements('relatedset'):
                 sub_node_name = sub_node['table']
@@ -242,6 +306,111 @@ class FMXMLObject(object):
                             sub_record[field_name] = column_data
                     sub_record['RECORDID'] = int(sub_result['record-id'])
                     sub_record['MODID'] = int(sub_result['mod-id'])
+                    sub_record._set_table(sub_node_name)
                     record[sub_node_name].append(sub_record)
 
             self.resultset.append(record)
+
+
+class FMRecordIDTarget(object):
+    '''
+    An lxml parser target that ignores everything in a FileMaker response
+    except for the error code and the ids of the top level records. Portal
+    records and the data of all other fields are skipped over without being
+    stored.
+
+    :param id_field: (*Optional*) The name of the field holding the id. If
+        not given the ``record-id`` of each record is used.
+    '''
+
+    def __init__(self, id_field=None):
+        self.id_field = id_field
+        self.ids = array('q')
+        self.errorcode = None
+        self.in_resultset = False
+        self.related = 0
+        self.capture = None
+        self.text = ''
+
+    def start(self, name, attrs):
+        name = name.replace('{http://www.filemaker.com/xml/fmresultset}', '')
+        if name == 'error':
+            self.errorcode = attrs.get('code')
+        elif name == 'ERRORCODE':
+            self.capture = 'error'
+        elif name == 'resultset':
+            self.in_resultset = True
+        elif name == 'relatedset':
+            self.related += 1
+        elif not self.in_resultset or self.related:
+            return
+        elif name == 'record' and self.id_field is None:
+            self.ids.append(int(attrs['record-id']))
+        elif name == 'field' and attrs.get('name') == self.id_field:
+            self.capture = 'field'
+        elif name == 'data' and self.capture == 'field':
+            self.capture = 'data'
+
+    def end(self, name):
+        name = name.replace('{http://www.filemaker.com/xml/fmresultset}', '')
+        if name == 'relatedset':
+            self.related -= 1
+        elif name == 'ERRORCODE':
+            self.errorcode = self.text.strip()
+        elif name == 'data' and self.capture == 'data':
+            if self.text.strip():
+                self.ids.append(int(self.text.strip()))
+        elif name == 'field' and self.capture:
+            self.capture = None
+        else:
+            return
+        self.capture = None
+        self.text = ''
+
+    def data(self, content):
+        if self.capture in ('error', 'data'):
+            self.text += force_text(content)
+
+    def comment(self, text):  # pragma: no cover
+        pass
+
+    def close(self):
+        return self
+
+
+class FMRecordIDs(object):
+    '''
+    A lightweight alternative to :py:class:`FMXMLObject` for when only the ids
+    of the records in a FileMaker response are needed. Parsing raises
+    :py:exc:`filemaker.exceptions.FileMakerServerError` in the same way.
+
+    .. py:attribute:: ids
+
+        An ``array('q')`` of the record ids, in the order they were returned.
+        The ids are either the ``record-id`` of each record, or the integer
+        value of the ``id_field`` field.
+
+    :param data: The raw XML data returned from FileMaker.
+    :param id_field: (*Optional*) The name of the field holding the id.
+    '''
+
+    def __init__(self, data, id_field=None):
+        target = FMRecordIDTarget(id_field)
+        parser = etree.XMLParser(target=target)
+        try:
+            etree.XML(data, parser)
+            self.errorcode = int(target.errorcode)
+        except (KeyError, TypeError, ValueError, etree.XMLSyntaxError):
+            raise FileMakerServerError(954)
+        if self.errorcode == 401:
+            self.ids = array('q')
+        elif not self.errorcode == 0:
+            raise FileMakerServerError(self.errorcode)
+        else:
+            self.ids = target.ids
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
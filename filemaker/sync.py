@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+from array import array
+from contextlib import contextmanager
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, transaction
+from django.utils.encoding import force_text
+
+from filemaker.conf import settings
+from filemaker.exceptions import FileMakerError
+from filemaker.utils import batches
+
+
+class SyncReport(object):
+    '''
+    The outcome of a sync to Django.
+
+    .. py:attribute:: synced
+
+        The number of records successfully written to the database.
+
+    .. py:attribute:: errors
+
+        A list of ``(instance, exception)`` tuples for the records that could
+        not be written.
+    '''
+
+    def __init__(self):
+        self.synced = 0
+        self.errors = []
+
+    def __repr__(self):
+        return '<SyncReport: {0} synced, {1} failed>'.format(
+            self.synced, len(self.errors))
+
+
+def _atomic():
+    # transaction.atomic() is only available from Django 1.6. Before that a
+    # savepoint is used inside a managed transaction, otherwise a new
+    # transaction is committed on success
+    if hasattr(transaction, 'atomic'):
+        return transaction.atomic()
+    if transaction.is_managed():
+        return _savepoint()
+    return transaction.commit_on_success()
+
+
+@contextmanager
+def _savepoint():
+    sid = transaction.savepoint()
+    try:
+        yield
+    except Exception:
+        transaction.savepoint_rollback(sid)
+        raise
+    else:
+        transaction.savepoint_commit(sid)
+
+
+def sync_to_django(instances, batch_size=None, report=None, **kwargs):
+    '''
+    Calls ``to_django`` on each of the given
+    :py:class:`filemaker.base.FileMakerModel` instances, committing the writes
+    in batches rather than once per record.
+
+    Each batch is wrapped in a single transaction, and each record within it
+    in a savepoint, so that a record that fails to save is rolled back and
+    recorded on the returned report without aborting the rest of the batch.
+
+    :param instances: An iterable of FileMaker model instances, e.g. a
+        :py:class:`filemaker.manager.Manager`.
+    :param batch_size: (*Optional*) The number of records to commit per
+        transaction. Defaults to the ``FILEMAKER_SYNC_BATCH_SIZE`` setting.
+    :param report: (*Optional*) An existing :py:class:`SyncReport` to add
+        the results to.
+    :param \**kwargs: Any additional arguments to pass to ``to_django``.
+    :rtype: :py:class:`SyncReport`
+    '''
+    report = report if report is not None else SyncReport()
+    batch_size = batch_size or settings.FILEMAKER_SYNC_BATCH_SIZE
+    for batch in batches(instances, batch_size):
+        with _atomic():
+            for instance in batch:
+                try:
+                    with _atomic():
+                        instance.to_django(**kwargs)
+                except (DatabaseError, FileMakerError,
+                        ValidationError, ValueError, TypeError) as e:
+                    report.errors.append((instance, e))
+                else:
+                    report.synced += 1
+    return report
+
+
+class Checkpoint(object):
+    '''
+    Records the progress of a long running sync as a small JSON document in a
+    Django storage backend, so that an interrupted sync can be resumed.
+
+    :param name: A name identifying the sync, used as the checkpoint filename.
+    :param storage: (*Optional*) The Django storage class to use. Defaults to
+        the default storage class.
+    '''
+
+    storage = default_storage
+
+    def __init__(self, name, storage=None):
+        self.name = name
+        if storage is not None:
+            self.storage = storage
+        self.path = 'filemaker/checkpoints/{0}.json'.format(name)
+        self.temp_path = 'filemaker/checkpoints/{0}.json.tmp'.format(name)
+
+    def load(self):
+        '''
+        Returns the saved checkpoint data, or an empty dictionary if there is
+        no checkpoint.
+        '''
+        for path in (self.path, self.temp_path):
+            if self.storage.exists(path):
+                f = self.storage.open(path)
+                try:
+                    return json.loads(force_text(f.read()))
+                finally:
+                    f.close()
+        return {}
+
+    def save(self, data):
+        '''
+        Replaces the saved checkpoint with ``data``.
+
+        The data is first saved under a temporary name, which is read if the
+        checkpoint itself is missing, so that there is always a checkpoint to
+        resume from if the sync is interrupted while it is being replaced.
+        '''
+        content = json.dumps(data)
+        self._delete(self.temp_path)
+        self.storage.save(self.temp_path, ContentFile(content))
+        self._delete(self.path)
+        self.storage.save(self.path, ContentFile(content))
+        self._delete(self.temp_path)
+
+    def clear(self):
+        '''
+        Removes the saved checkpoint.
+        '''
+        self._delete(self.path)
+        self._delete(self.temp_path)
+
+    def _delete(self, path):
+        if self.storage.exists(path):
+            self.storage.delete(path)
+
+
+def _record_key(instance):
+    fm_obj = getattr(instance, '_fm_obj', None) or {}
+    return '{0}'.format(fm_obj.get('RECORDID')), fm_obj.get('MODID')
+
+
+def sync_manager(manager, page_size=None, batch_size=None, checkpoint=None,
+                 resume=False, **kwargs):
+    '''
+    Syncs every record matched by ``manager`` to Django, paging through the
+    found set with the ``-skip`` and ``-max`` parameters.
+
+    If a :py:class:`Checkpoint` is given, progress is saved to it after each
+    page has been committed, and the sync can later be restarted from the
+    last completed page with ``resume=True``. Because records may have been
+    added or removed in FileMaker in the meantime, a resumed sync starts
+    one page before the checkpoint, and skips the records from that page
+    whose ``RECORDID`` and ``MODID`` show they have already been synced
+    unchanged. The checkpoint is cleared once the sync completes.
+
+    If ``manager`` is :py:meth:`filemaker.manager.Manager.lenient`, records
+    with invalid values are skipped and their errors are collected on its
+    ``load_errors`` attribute.
+
+    :param manager: A :py:class:`filemaker.manager.Manager`. If it has no
+        ordering the model's ``pk_name`` field is used, so that the pages are
+        stable.
+    :param page_size: (*Optional*) The number of records to fetch from
+        FileMaker per request. Defaults to the ``FILEMAKER_SYNC_PAGE_SIZE``
+        setting.
+    :param batch_size: (*Optional*) The number of records to commit per
+        transaction, see :py:func:`sync_to_django`.
+    :param checkpoint: (*Optional*) A :py:class:`Checkpoint` instance.
+    :param resume: (*Optional*) Whether to resume from the ``checkpoint``.
+    :param \**kwargs: Any additional arguments to pass to ``to_django``.
+    :rtype: :py:class:`SyncReport`
+    '''
+    page_size = page_size or settings.FILEMAKER_SYNC_PAGE_SIZE
+    pk_name = manager.cls._meta['pk_name']
+    if pk_name and not any(
+            key.startswith('-sortfield') for key in manager.params):
+        manager = manager.order_by(pk_name)
+    skip = 0
+    completed = {}
+    if checkpoint is not None and resume:
+        state = checkpoint.load()
+        skip = max(state.get('skip', 0) - page_size, 0)
+        completed = state.get('completed', {})
+    report = SyncReport()
+    while True:
+        page = manager.set_skip_records(skip).set_group_size(page_size)
+        instances = list(page)
+        pending = []
+        for instance in instances:
+            record_id, mod_id = _record_key(instance)
+            if completed.get(record_id) != mod_id:
+                pending.append(instance)
+        errors = len(report.errors)
+        sync_to_django(pending, batch_size=batch_size, report=report,
+                       **kwargs)
+        # Count the records fetched, which includes any a lenient manager
+        # skipped as invalid
+        fetched = len(page)
+        skip += fetched
+        # Records that failed to save are retried if the sync is resumed
+        failed = set(id(instance) for instance, error
+                     in report.errors[errors:])
+        completed = dict(_record_key(instance) for instance in instances
+                         if id(instance) not in failed)
+        if checkpoint is not None:
+            checkpoint.save({'skip': skip, 'completed': completed})
+        if fetched < page_size:
+            break
+    if checkpoint is not None:
+        checkpoint.clear()
+    return report
+
+
+def fetch_ids(manager, page_size=None):
+    '''
+    Returns the ids of every record matched by ``manager`` as a sorted
+    ``array('q')``, without downloading or parsing the rest of the record
+    data.
+
+    The ids are the values of the model's ``pk_name`` field, or the
+    ``RECORDID`` if the model has no ``pk_name``. Pages of ids are fetched
+    by key (asking for the ids greater than the last one seen) so that
+    records added or deleted during the scan don't shift the records of
+    later pages. Models without a ``pk_name``, and managers that filter on
+    it or use the ``or`` logical operator, can only be paged with ``-skip``.
+
+    :param manager: A :py:class:`filemaker.manager.Manager`.
+    :param page_size: (*Optional*) The number of ids to fetch per request.
+        Defaults to ten times the ``FILEMAKER_SYNC_PAGE_SIZE`` setting.
+    '''
+    page_size = page_size or settings.FILEMAKER_SYNC_PAGE_SIZE * 10
+    pk_name = manager.cls._meta['pk_name']
+    id_field = None
+    seek = False
+    if pk_name:
+        id_field = manager._resolve_fm_field(pk_name)
+        seek = manager._can_seek(pk_name)
+        # Sorting on the server means that we should rarely need to sort
+        # the ids ourselves
+        manager = manager.order_by(pk_name)
+    ids = array('q')
+    page = manager.set_group_size(page_size)
+    while True:
+        page_ids = page.find_ids(id_field=id_field)
+        ids.extend(page_ids.ids)
+        if len(page_ids) < page_size:
+            break
+        if seek:
+            page = manager._keyset_manager(
+                pk_name, max(page_ids.ids), page_size)
+        else:
+            page = manager.set_skip_records(
+                len(ids)).set_group_size(page_size)
+    if any(ids[i] > ids[i + 1] for i in range(len(ids) - 1)):
+        ids = array('q', sorted(ids))
+    return ids
+
+
+def _has_criteria(manager):
+    # Whether the manager's params restrict the records found, other than
+    # limiting how many of them are returned
+    return any(not key.startswith('-') or key in ('-recid', '-modid')
+               for key in manager.params)
+
+
+def sweep_deletions(manager, flag_field=None, page_size=None,
+                    batch_size=None, queryset=None):
+    '''
+    Finds the Django instances for records that no longer exist in FileMaker
+    and deletes them, or if ``flag_field`` is given, sets that field to
+    ``True`` on them instead.
+
+    Only the ids of the FileMaker records are fetched (see
+    :py:func:`fetch_ids`), and these are compared against the primary keys of
+    the Django model by walking both in order, so memory use is proportional
+    to the number of records rather than their size. The model must have a
+    ``pk_name``, whose values are the primary keys of the Django instances.
+
+    :param manager: A :py:class:`filemaker.manager.Manager` for a model with
+        a ``model`` and ``pk_name`` in its ``meta``. If the manager is
+        filtered, ``queryset`` must be given.
+    :param flag_field: (*Optional*) A boolean field on the Django model to set
+        instead of deleting the missing instances.
+    :param page_size: (*Optional*) The number of ids to fetch per request.
+    :param batch_size: (*Optional*) The number of instances to delete or flag
+        per query. Defaults to the ``FILEMAKER_SYNC_BATCH_SIZE`` setting.
+    :param queryset: (*Optional*) The Django instances matching the records
+        found by ``manager``, that are removed if their record is missing.
+        Defaults to all of the instances of the model.
+    :returns: An ``array('q')`` of the primary keys of the missing instances.
+    '''
+    meta = manager.cls._meta
+    if not meta['pk_name']:
+        # Without it the Django primary keys are unrelated to the records
+        raise ValueError('Deletions can only be swept for a model with a '
+                         'pk_name')
+    if queryset is None:
+        if _has_criteria(manager):
+            raise ValueError('A queryset matching the records found by a '
+                             'filtered manager must be given')
+        queryset = meta['model']._default_manager.all()
+    batch_size = batch_size or settings.FILEMAKER_SYNC_BATCH_SIZE
+    ids = fetch_ids(manager, page_size=page_size)
+    pk_name = meta['django_pk_name']
+    missing = array('q')
+    i = 0
+    pks = queryset.order_by(pk_name).values_list(pk_name, flat=True)
+    for pk in pks.iterator():
+        while i < len(ids) and ids[i] < pk:
+            i += 1
+        if i == len(ids) or not ids[i] == pk:
+            missing.append(pk)
+    for batch in batches(missing, batch_size):
+        batch_qs = queryset.filter(**{'{0}__in'.format(pk_name): batch})
+        if flag_field:
+            batch_qs.update(**{flag_field: True})
+        else:
+            batch_qs.delete()
+    return missing
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import threading
+from collections import OrderedDict
+from itertools import islice
+
 from django.utils.importlib import import_module
 from django.utils.six import string_types
 
@@ -24,3 +28,57 @@ def get_field_class(cls):
     if isinstance(fm_cls, string_types):
         fm_cls = import_string(fm_cls)
     return fm_cls
+
+
+def batches(iterable, size):
+    '''
+    Splits ``iterable`` into lists of at most ``size`` items.
+    '''
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class LRUCache(object):
+    '''
+    A simple thread safe least recently used cache, holding up to ``size``
+    items.
+
+    Caches are shared rather than copied when deep copied, so that the
+    field instances copied onto each model instance share their cache with
+    the field declared on the model class.
+    '''
+
+    def __init__(self, size):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -1,10 +1,50 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from django.core import validators
 from django.core.validators import RegexValidator
 
+from filemaker.utils import LRUCache
+
 
 gtin_re = r'^[0-9]{6,8}$|^[0-9]{10}$|^[0-9]{12}$|^[0-9]{13}$|^[0-9]{14,}$'
 
 validate_gtin = \
     RegexValidator(gtin_re, 'Please enter a valid GTIN/ISBN/EAN/UPC code.')
+
+
+class CachedValidator(object):
+    '''
+    Wraps a validator, remembering up to ``cache_size`` values that have
+    already passed validation so they are not validated again, e.g. on the
+    next sync of the same records. Values that fail are always re-validated,
+    so the validator raises the same ``ValidationError`` every time.
+
+    :param validator: The validator to wrap.
+    :param cache_size: (*Optional*) The maximum number of valid values to
+        remember. Defaults to 1000.
+    '''
+
+    def __init__(self, validator, cache_size=1000):
+        self.validator = validator
+        self.cache = LRUCache(cache_size)
+
+    def __call__(self, value):
+        try:
+            if self.cache.get(value, False):
+                return
+        except TypeError:
+            return self.validator(value)
+        self.validator(value)
+        self.cache.set(value, True)
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+validate_email = CachedValidator(validators.validate_email)
+validate_ipv46_address = CachedValidator(validators.validate_ipv46_address)
+validate_ipv4_address = CachedValidator(validators.validate_ipv4_address)
+validate_ipv6_address = CachedValidator(validators.validate_ipv6_address)
+validate_url = CachedValidator(validators.URLValidator())
+validate_gtin = CachedValidator(validate_gtin)